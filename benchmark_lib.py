@@ -0,0 +1,240 @@
+import os.path
+import json
+import time
+import platform
+import contextlib
+import datetime as dt
+import pandas as pd
+import numpy as np
+import statistics_lib as stat
+import optimization_lib as opt
+import factor_model_lib as fm
+
+BENCHMARK_DIR = "benchmarks"
+BENCHMARK_DATA_DIR = os.path.join(BENCHMARK_DIR, "data")
+TRADING_DAYS = 252
+GENERATOR_VERSION = 1
+
+def synthetic_tickers(num_tickers:int) -> list:
+    """
+    :param num_tickers: number of tickers
+    :return: list of synthetic Bloomberg style tickers, ie. S0001 CN
+    """
+
+    return [f"S{i:04d} CN" for i in range(1, num_tickers + 1)]
+
+
+def write_synthetic_market_data(data_dir:str, num_tickers:int, num_years:float, seed:int=0, start_date:str="2000-01-03", chunk_tickers:int=500) -> list:
+    """
+    Writes a synthetic universe in the market_data layout: one csv of Dates and PX_LAST per ticker and a dividends.csv. The prices follow a one factor
+    model (a market factor with random betas plus idiosyncratic noise), about 80% of the tickers pay quarterly dividends and about 5% of the tickers
+    (never the first one, which sets the dates of the returns matrix) list part way through. The same parameters always give the same files, and
+    the files are only written again if the parameters changed.
+
+    :param data_dir: folder to write the files to
+    :param num_tickers: number of tickers
+    :param num_years: number of years of business days
+    :param seed: seed of the random generator
+    :param start_date: first date
+    :param chunk_tickers: number of tickers generated at a time, which bounds the memory used
+    :return: list of the tickers
+
+    Last Updated October 18, 2026
+    """
+
+    tickers = synthetic_tickers(num_tickers)
+    params = {"num_tickers": num_tickers, "num_years": num_years, "seed": seed, "start_date": start_date, "version": GENERATOR_VERSION}
+    params_fname = os.path.join(data_dir, "synthetic.json")
+    if os.path.isfile(params_fname):
+        with open(params_fname, "r") as f:
+            if json.load(f) == params:
+                return tickers
+
+    os.makedirs(data_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range(start_date, periods=max(2, int(round(TRADING_DAYS*num_years))))
+    date_strings = np.asarray(dates.strftime("%Y-%m-%d"), dtype=object)
+    ex_date_strings = np.asarray(dates.strftime("%Y-%m-%d 00:00:00.000"), dtype=object)
+    payable_date_strings = np.asarray((dates + pd.Timedelta(days=30)).strftime("%Y-%m-%d 00:00:00.000"), dtype=object)
+    num_days = len(dates)
+    market_returns = rng.normal(0.0003, 0.01, num_days)
+
+    dvd_rows = []
+    for first in range(0, num_tickers, chunk_tickers):
+        chunk = tickers[first:first + chunk_tickers]
+        betas = rng.uniform(0.5, 1.5, len(chunk))
+        daily_returns = market_returns[:, None]*betas + rng.normal(0, 0.015, (num_days, len(chunk)))
+        prices = np.round(rng.uniform(10, 200, len(chunk))*np.exp(np.cumsum(daily_returns, axis=0)), 2).clip(min=0.01)
+        first_rows = np.where(rng.random(len(chunk)) < 0.05, rng.integers(0, num_days // 2 + 1, len(chunk)), 0)
+        if first == 0:
+            first_rows[0] = 0
+        pays_dividends = rng.random(len(chunk)) < 0.8
+        dvd_offsets = rng.integers(5, 63, len(chunk))
+        dvd_yields = rng.uniform(0.002, 0.01, len(chunk))
+
+        for j, ticker in enumerate(chunk):
+            rows = slice(first_rows[j], num_days)
+            with open(os.path.join(data_dir, f"{ticker.split(' ')[0]}.csv"), "w") as f:
+                f.write("Dates,PX_LAST\n")
+                f.write("".join(f"{d},{p:.2f}\n" for d, p in zip(date_strings[rows], prices[rows, j])))
+
+            if pays_dividends[j]:
+                # quarterly ex-dates, never on the first day of the ticker
+                for ex_row in range(first_rows[j] + dvd_offsets[j], num_days, 63):
+                    dvd_rows.append((ticker, ex_date_strings[ex_row], payable_date_strings[ex_row], round(float(dvd_yields[j]*prices[ex_row, j]), 2)))
+
+    with open(os.path.join(data_dir, "dividends.csv"), "w") as f:
+        f.write("id,gx_id,ticker,ex_date,payable_date,dvd_amount,currency\n")
+        f.write("".join(f"{i},NULL,{ticker},{ex_date},{payable_date},{amount},CAD\n" for i, (ticker, ex_date, payable_date, amount) in enumerate(dvd_rows, start=1)))
+    with open(params_fname, "w") as f:
+        json.dump(params, f)
+    return tickers
+
+
+def time_call(func, repeats:int=3) -> float:
+    """
+    :param func: function without arguments to time
+    :param repeats: number of times to run it
+    :return: the fastest run in seconds
+    """
+
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def quiet(func):
+    """
+    :param func: function to run without its progress prints, ie. the loading line of every security
+    :return: function that runs func with stdout discarded
+    """
+
+    def wrapper(*args, **kwargs):
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def cplex_available() -> bool:
+    return opt.cplex is not None
+
+
+def run_benchmarks(num_tickers:int, num_years:float, data_root:str=BENCHMARK_DATA_DIR, repeats:int=3, max_dense_assets:int=1000, num_factors:int=20, seed:int=0) -> list:
+    """
+    Times the main stages of the pipeline on a synthetic universe: calc_returns_matrix (without and with the cache), total_return_calc,
+    calc_port_return, minimize_active_risk (dense and factor covariance, with each solver) and a rebalance backtest.
+    A benchmark that cannot run, ie. the cplex solver when cplex is not installed, is recorded as skipped with the reason.
+
+    :param num_tickers: number of tickers in the universe
+    :param num_years: number of years of data
+    :param data_root: folder where the synthetic universes are written
+    :param repeats: number of runs of each benchmark, the fastest is recorded
+    :param max_dense_assets: universes larger than this skip the benchmarks that need the dense covariance matrix
+    :param num_factors: number of factors of the factor covariance benchmarks
+    :param seed: seed of the synthetic data
+    :return: list of result dictionaries with the keys benchmark, num_tickers, num_years, status ("ok" or "skipped"), seconds and reason
+
+    Last Updated October 18, 2026
+    """
+
+    results = []
+    def record(benchmark:str, func=None, reason:str=None):
+        result = {"benchmark": benchmark, "num_tickers": num_tickers, "num_years": num_years}
+        if reason is not None:
+            result.update({"status": "skipped", "seconds": None, "reason": reason})
+        else:
+            result.update({"status": "ok", "seconds": time_call(func, repeats), "reason": None})
+        print(f"{benchmark} ({num_tickers} tickers, {num_years} years): " + (f"skipped, {reason}" if reason is not None else f"{result['seconds']:.4f}s"))
+        results.append(result)
+
+    data_dir = os.path.join(data_root, f"{num_tickers}x{num_years}")
+    _start_time = time.perf_counter()
+    tickers = write_synthetic_market_data(data_dir, num_tickers, num_years, seed=seed)
+    print(f"Synthetic data for {num_tickers} tickers and {num_years} years ready in {time.perf_counter() - _start_time:.1f}s")
+    sec_list = tickers + ["cash"]
+    dense = num_tickers <= max_dense_assets
+    too_large = f"more than {max_dense_assets} assets for a dense covariance matrix"
+
+    # returns matrix, from the files and from the cache
+    calc_returns_matrix = quiet(stat.calc_returns_matrix)
+    record("calc_returns_matrix", lambda: calc_returns_matrix(sec_list=list(sec_list), data_dir=data_dir, use_cache=False))
+    tr_frame = calc_returns_matrix(sec_list=list(sec_list), data_dir=data_dir)
+    record("calc_returns_matrix_cached", lambda: calc_returns_matrix(sec_list=list(sec_list), data_dir=data_dir))
+
+    # total return of the first security, which has the full history
+    security = quiet(stat.equity_returns)(tickers[0], data_dir=data_dir)
+    security_data = quiet(stat.load_security_data)(tickers[0], data_dir=data_dir)
+    record("total_return_calc", lambda: security.total_return_calc(security_data.copy(), "PX_LAST", "dvd_amount"))
+
+    tr_matrix = stat.ReturnsMatrix.from_frame(tr_frame)
+    bench_wt = {ticker: 1/num_tickers for ticker in tickers}
+    bench_wt["cash"] = 0
+    testing_rows = min(TRADING_DAYS, len(tr_matrix) // 2)
+    training = tr_matrix.window(end_date=tr_matrix.index[-testing_rows - 1])
+    dt_list = tr_matrix.index[-testing_rows:]
+    record("calc_port_return", lambda: stat.calc_port_return(dt_list, bench_wt, tr_matrix))
+
+    # optimizer, with the covariance calculated once outside of the timing
+    cash_drag = 0.01
+    cov_frame = training.cov() if dense else None
+    factor_cov = fm.pca_factor_model(training, num_factors=num_factors)
+    for solver in ["numpy", "cplex"]:
+        if solver == "cplex" and not cplex_available():
+            record(f"minimize_active_risk_dense_{solver}", reason="cplex is not installed")
+            record(f"minimize_active_risk_factor_{solver}", reason="cplex is not installed")
+            continue
+        if dense:
+            record(f"minimize_active_risk_dense_{solver}", lambda: opt.minimize_active_risk(bench_wt, cash_drag, cov_matrix=cov_frame, solver=solver))
+        else:
+            record(f"minimize_active_risk_dense_{solver}", reason=too_large)
+        record(f"minimize_active_risk_factor_{solver}", lambda: opt.minimize_active_risk(bench_wt, cash_drag, cov_matrix=factor_cov, solver=solver))
+
+    # rebalance backtests over the testing period: the default portfolio daily, and the optimized portfolio monthly with an updating covariance
+    def default_wt(rebal_date, bench, history):
+        return {ticker: cash_drag if ticker == "cash" else wt - cash_drag/num_tickers for ticker, wt in bench.items()}
+    record("backtest_default_daily", lambda: stat.run_backtest(tr_matrix, dt_list, bench_wt, default_wt, rebalance="daily"))
+
+    def optimized_backtest():
+        if dense:
+            cov_estimator = stat.covariance_estimator(columns=tr_matrix.columns)
+            optimizer = opt.ActiveRiskOptimizer()
+            def optimized_wt(rebal_date, bench, history):
+                cov_estimator.add(history.values[cov_estimator.count:])
+                return opt.minimize_active_risk(bench, cash_drag, cov_matrix=cov_estimator, optimizer=optimizer)
+        else:
+            optimizer = opt.ActiveRiskOptimizer()
+            def optimized_wt(rebal_date, bench, history):
+                return opt.minimize_active_risk(bench, cash_drag, cov_matrix=fm.pca_factor_model(history, num_factors=num_factors), optimizer=optimizer)
+        stat.run_backtest(tr_matrix, dt_list, bench_wt, optimized_wt, rebalance="monthly")
+    record("backtest_optimized_monthly", optimized_backtest)
+    return results
+
+
+def environment() -> dict:
+    """
+    :return: dictionary of the versions and machine the benchmarks ran on
+    """
+
+    return {"date": dt.datetime.now().strftime("%Y-%m-%d %H:%M:%S"), "python": platform.python_version(), "numpy": np.__version__, "pandas": pd.__version__,
+            "platform": platform.platform(), "processor": platform.processor(), "cpu_count": os.cpu_count(), "cplex": cplex_available()}
+
+
+def compare_to_baseline(results:list, baseline:list, threshold:float=1.25, min_seconds:float=0.02) -> pd.DataFrame:
+    """
+    :param results: list of result dictionaries from run_benchmarks
+    :param baseline: list of result dictionaries of a previous run
+    :param threshold: a benchmark that takes more than this multiple of its baseline time is flagged as a regression
+    :param min_seconds: a benchmark also has to be at least this much slower than its baseline to be flagged, so the timing noise of very fast benchmarks is ignored
+    :return: DataFrame of each benchmark's seconds, baseline_seconds, ratio and regression flag
+    """
+
+    keys = ["benchmark", "num_tickers", "num_years"]
+    current = pd.DataFrame(results)[keys + ["seconds"]]
+    previous = pd.DataFrame(baseline)[keys + ["seconds"]].rename(columns={"seconds": "baseline_seconds"})
+    comparison = current.merge(previous, on=keys, how="left")
+    comparison["ratio"] = comparison["seconds"] / comparison["baseline_seconds"]
+    comparison["regression"] = (comparison["ratio"] > threshold) & (comparison["seconds"] - comparison["baseline_seconds"] > min_seconds)
+    return comparison
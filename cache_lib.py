@@ -0,0 +1,162 @@
+import os.path
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import profiling_lib as prof
+
+TAIL_BYTES = 64
+
+class returns_matrix_cache():
+    def __init__(self, cache_dir:str, sec_list:list, source_files:list, start_date=None, end_date=None):
+        """
+        On-disk cache of a finished total returns matrix. The matrix values are stored as a raw row-major float64 file and the dates as a text file, both
+        of which can be appended to when the source csv files only had new rows added. meta.json holds the shape, the source files' sizes/mtimes and the
+        per security state needed to continue the total return calculation.
+
+        :param cache_dir: folder where the cache entries are stored
+        :param sec_list: list of securities in the returns matrix (column order)
+        :param source_files: list of the market data files that the returns matrix is calculated from
+        :param start_date: start date the returns matrix was requested for
+        :param end_date: end date the returns matrix was requested for
+
+        Last Updated October 18, 2026
+        """
+
+        self.sec_list = list(sec_list)
+        self.source_files = [os.path.abspath(f) for f in source_files]
+
+        _key = json.dumps({"sec_list": self.sec_list, "source_files": self.source_files, "start_date": str(start_date), "end_date": str(end_date)})
+        self.path = os.path.join(cache_dir, hashlib.sha1(_key.encode()).hexdigest()[:16])
+        self.meta_fname = os.path.join(self.path, "meta.json")
+        self.values_fname = os.path.join(self.path, "values.f64")
+        self.dates_fname = os.path.join(self.path, "dates.txt")
+
+        self.meta = None
+        if os.path.isfile(self.meta_fname):
+            with open(self.meta_fname, "r") as f:
+                self.meta = json.load(f)
+
+    @property
+    def state(self) -> dict:
+        return {} if self.meta is None else self.meta["state"]
+
+    def file_states(self) -> dict:
+        """
+        Size, modified time and the last bytes of every source file. The last bytes let us check that a file that grew was only appended to.
+        :return: dictionary of file path to its state
+        """
+
+        states = {}
+        for fname in self.source_files:
+            stat_result = os.stat(fname)
+            with open(fname, "rb") as f:
+                f.seek(max(0, stat_result.st_size - TAIL_BYTES))
+                tail = f.read()
+            states[fname] = {"size": stat_result.st_size, "mtime_ns": stat_result.st_mtime_ns, "tail": tail.hex()}
+        return states
+
+    def is_current(self) -> bool:
+        """
+        :return: True if the cache exists and none of the source files have changed since it was written
+        """
+
+        if self.meta is None:
+            return False
+        for fname in self.source_files:
+            stat_result = os.stat(fname)
+            cached = self.meta["files"].get(fname)
+            if cached is None or cached["size"] != stat_result.st_size or cached["mtime_ns"] != stat_result.st_mtime_ns:
+                return False
+        return True
+
+    def appended_files(self):
+        """
+        Checks whether every changed source file was only appended to.
+        :return: dictionary of file path to the byte offset where the appended rows begin, or None if any file was rewritten and the cache has to be rebuilt
+        """
+
+        if self.meta is None or self.meta["num_rows"] == 0:
+            return None
+
+        appended = {}
+        for fname in self.source_files:
+            cached = self.meta["files"].get(fname)
+            if cached is None:
+                return None
+            stat_result = os.stat(fname)
+            if cached["size"] == stat_result.st_size and cached["mtime_ns"] == stat_result.st_mtime_ns:
+                continue
+            if stat_result.st_size < cached["size"]:
+                return None
+
+            # the bytes before the old end of file must be unchanged and end on a complete line
+            cached_tail = bytes.fromhex(cached["tail"])
+            with open(fname, "rb") as f:
+                f.seek(cached["size"] - len(cached_tail))
+                if f.read(len(cached_tail)) != cached_tail or not cached_tail.endswith(b"\n"):
+                    return None
+            appended[fname] = cached["size"]
+        return appended
+
+    @prof.timed("returns_cache")
+    def load(self) -> pd.DataFrame:
+        """
+        :return: the cached returns matrix
+        """
+
+        num_rows = self.meta["num_rows"]
+        columns = self.meta["columns"]
+        values = np.fromfile(self.values_fname, dtype=np.float64, count=num_rows*len(columns)).reshape(num_rows, len(columns))
+        with open(self.dates_fname, "rb") as f:
+            dates = f.read(self.meta["dates_bytes"]).decode().split("\n")[:num_rows]
+
+        total_returns_matrix = pd.DataFrame(values, index=pd.Index(dates, name="Dates"), columns=columns)
+        if "cash" in columns:
+            total_returns_matrix["cash"] = 0
+        return total_returns_matrix
+
+    @prof.timed("returns_cache")
+    def save(self, total_returns_matrix:pd.DataFrame, state:dict, file_states:dict) -> None:
+        """
+        Writes the full returns matrix to the cache
+        :param total_returns_matrix: total returns matrix indexed by date
+        :param state: per security state used to extend the total returns
+        :param file_states: source file states captured before the source files were read
+        """
+
+        os.makedirs(self.path, exist_ok=True)
+        np.ascontiguousarray(total_returns_matrix.to_numpy(dtype=np.float64)).tofile(self.values_fname)
+        with open(self.dates_fname, "wb") as f:
+            dates_bytes = f.write("".join(f"{d}\n" for d in total_returns_matrix.index).encode())
+        self._write_meta(num_rows=total_returns_matrix.shape[0], dates_bytes=dates_bytes, columns=total_returns_matrix.columns.tolist(), state=state, file_states=file_states)
+
+    @prof.timed("returns_cache")
+    def append(self, new_rows:pd.DataFrame, state:dict, file_states:dict) -> None:
+        """
+        Appends new dates to the cached returns matrix
+        :param new_rows: returns matrix of the new dates only, with the same columns as the cache
+        :param state: per security state as of the last new date
+        :param file_states: source file states captured before the source files were read
+        """
+
+        num_rows = self.meta["num_rows"]
+        columns = self.meta["columns"]
+
+        # drop anything past the recorded size in case a previous append was interrupted
+        with open(self.values_fname, "r+b") as f:
+            f.truncate(num_rows*len(columns)*8)
+            f.seek(0, os.SEEK_END)
+            np.ascontiguousarray(new_rows[columns].to_numpy(dtype=np.float64)).tofile(f)
+        with open(self.dates_fname, "r+b") as f:
+            f.truncate(self.meta["dates_bytes"])
+            f.seek(0, os.SEEK_END)
+            dates_bytes = self.meta["dates_bytes"] + f.write("".join(f"{d}\n" for d in new_rows.index).encode())
+        self._write_meta(num_rows=num_rows + new_rows.shape[0], dates_bytes=dates_bytes, columns=columns, state=state, file_states=file_states)
+
+    def _write_meta(self, num_rows:int, dates_bytes:int, columns:list, state:dict, file_states:dict) -> None:
+        self.meta = {"num_rows": num_rows, "dates_bytes": dates_bytes, "columns": columns, "files": file_states, "state": state}
+        _tmp_fname = self.meta_fname + ".tmp"
+        with open(_tmp_fname, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(_tmp_fname, self.meta_fname)
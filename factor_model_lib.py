@@ -0,0 +1,150 @@
+import pandas as pd
+import numpy as np
+import statistics_lib as stat
+import profiling_lib as prof
+
+class factor_model():
+    def __init__(self, loadings:np.ndarray, factor_cov:np.ndarray, specific_var:np.ndarray, columns:list=None):
+        """
+        Factor risk model of the covariance matrix in its low rank plus diagonal form, C = BFB' + D. Only the n x k loadings, the k x k factor
+        covariance and the n specific variances are stored, the dense n x n covariance matrix is never built.
+
+        :param loadings: n x k array B of the assets' exposures to the factors
+        :param factor_cov: k x k covariance matrix F of the factor returns
+        :param specific_var: array D of the n specific (idiosyncratic) variances
+        :param columns: optional, list of the tickers of the n assets
+
+        Last Updated October 18, 2026
+        """
+
+        self.loadings = np.ascontiguousarray(loadings, dtype=np.float64)
+        self.factor_cov = np.ascontiguousarray(factor_cov, dtype=np.float64)
+        self.specific_var = np.ascontiguousarray(specific_var, dtype=np.float64)
+        self.columns = None if columns is None else list(columns)
+
+        if self.loadings.shape != (len(self.specific_var), len(self.factor_cov)):
+            raise ValueError("Error: The loadings have to be a number of assets by number of factors array.")
+
+    @property
+    def num_assets(self) -> int:
+        return self.loadings.shape[0]
+
+    @property
+    def num_factors(self) -> int:
+        return self.loadings.shape[1]
+
+    def subset(self, sec_list:list):
+        """
+        :param sec_list: list of tickers
+        :return: factor_model of the tickers in the order of sec_list
+        """
+
+        if self.columns is None:
+            raise ValueError("Error: The factor model has no tickers to select from.")
+        if sec_list == self.columns:
+            return self
+        column_index = {col: j for j, col in enumerate(self.columns)}
+        rows = [column_index[col] for col in sec_list]
+        return factor_model(self.loadings[rows], self.factor_cov, self.specific_var[rows], columns=sec_list)
+
+    def matvec(self, x:np.ndarray) -> np.ndarray:
+        """
+        :param x: array of weights
+        :return: the covariance matrix times x, BF(B'x) + Dx
+        """
+
+        return self.loadings @ (self.factor_cov @ (self.loadings.T @ x)) + self.specific_var*x
+
+    def variance(self, x:np.ndarray) -> float:
+        """
+        :param x: array of weights
+        :return: the variance x'Cx of the portfolio returns
+        """
+
+        exposures = self.loadings.T @ x
+        return float(exposures @ self.factor_cov @ exposures + np.sum(self.specific_var*x*x))
+
+    def diag(self) -> np.ndarray:
+        """
+        :return: the total variance of each asset, the diagonal of the covariance matrix
+        """
+
+        return np.einsum("ij,jk,ik->i", self.loadings, self.factor_cov, self.loadings) + self.specific_var
+
+    def inverse_matvec(self, v:np.ndarray, rows:np.ndarray=None) -> np.ndarray:
+        """
+        Solves C_rr z = v for the covariance matrix of a subset of the assets with the Woodbury identity,
+        inv(D + BFB') = inv(D) - inv(D)BF inv(I + B'inv(D)BF) B'inv(D), in O(nk^2) instead of O(n^3).
+        The specific variances of the assets in the subset have to be positive.
+
+        :param v: array or n x r array of right hand sides
+        :param rows: optional, boolean mask or indices of the assets in the subset. by default all assets
+        :return: the solution z with the same shape as v
+        """
+
+        loadings = self.loadings if rows is None else self.loadings[rows]
+        specific_inv = 1 / (self.specific_var if rows is None else self.specific_var[rows])
+        weighted_v = specific_inv[:, None]*v.reshape(len(specific_inv), -1)
+        weighted_loadings = specific_inv[:, None]*loadings
+        capacitance = np.eye(self.num_factors) + (loadings.T @ weighted_loadings) @ self.factor_cov
+        correction = weighted_loadings @ (self.factor_cov @ np.linalg.solve(capacitance, loadings.T @ weighted_v))
+        return (weighted_v - correction).reshape(v.shape)
+
+    def cov(self):
+        """
+        :return: the dense covariance matrix. A DataFrame if the columns were provided. Only for small universes
+        """
+
+        cov_matrix = self.loadings @ self.factor_cov @ self.loadings.T + np.diag(self.specific_var)
+        if self.columns is None:
+            return cov_matrix
+        return pd.DataFrame(cov_matrix, index=self.columns, columns=self.columns)
+
+
+@prof.timed("factor_model")
+def pca_factor_model(tr_matrix, num_factors:int=10, specific_floor:float=1e-6, oversample:int=10, power_iterations:int=4, seed:int=0) -> factor_model:
+    """
+    Estimates a statistical factor model from the principal components of the returns. The loadings are the first num_factors eigenvectors of the sample
+    covariance matrix, the factor covariance is the diagonal of their eigenvalues and the specific variances are what the factors do not explain of
+    each asset's variance. For large universes the principal components are found with a randomized range finder, so the n x n covariance matrix is
+    never built.
+
+    :param tr_matrix: returns matrix of the universe of assets, as a ReturnsMatrix or a DataFrame
+    :param num_factors: number of factors
+    :param specific_floor: the specific variance of each asset is at least this fraction of its total variance, so that the covariance matrix stays
+                           positive definite. assets with no variance (ie. cash) get no loadings and no specific variance
+    :param oversample: extra directions of the randomized range finder
+    :param power_iterations: number of power iterations of the randomized range finder
+    :param seed: seed of the randomized range finder
+    :return: factor_model with the same columns as tr_matrix
+
+    Last Updated October 18, 2026
+    """
+
+    tr_matrix = stat.as_returns_matrix(tr_matrix)
+    num_days, num_assets = tr_matrix.shape
+    if num_days < 2:
+        raise ValueError("Error: At least 2 days of returns are needed to estimate the factor model.")
+    num_factors = min(num_factors, num_days - 1, num_assets)
+
+    demeaned = (tr_matrix.values - tr_matrix.values.mean(axis=0)) / np.sqrt(num_days - 1)
+    total_var = np.einsum("ij,ij->j", demeaned, demeaned)
+
+    if num_factors + oversample < min(num_days, num_assets) // 2:
+        # randomized range finder: the top singular vectors of the returns from a few passes of products with a thin random matrix
+        rng = np.random.default_rng(seed)
+        basis = np.linalg.qr(demeaned @ rng.standard_normal((num_assets, num_factors + oversample)))[0]
+        for _ in range(power_iterations):
+            basis = np.linalg.qr(demeaned.T @ basis)[0]
+            basis = np.linalg.qr(demeaned @ basis)[0]
+        _, singular_values, components = np.linalg.svd(basis.T @ demeaned, full_matrices=False)
+    else:
+        _, singular_values, components = np.linalg.svd(demeaned, full_matrices=False)
+
+    loadings = components[:num_factors].T.copy()
+    factor_var = singular_values[:num_factors]**2
+
+    has_var = total_var > 0
+    loadings[~has_var] = 0
+    specific_var = np.where(has_var, np.maximum(total_var - (loadings**2) @ factor_var, specific_floor*total_var), 0)
+    return factor_model(loadings, np.diag(factor_var), specific_var, columns=tr_matrix.columns)
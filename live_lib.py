@@ -0,0 +1,196 @@
+import os.path
+import json
+import datetime as dt
+import pandas as pd
+import numpy as np
+import statistics_lib as stat
+import optimization_lib as opt
+import profiling_lib as prof
+
+STATE_FNAME = "live_state.json"
+ARRAYS_FNAME = "live_state.npz"
+
+class live_pipeline():
+    def __init__(self, benchmark_weights:dict, cash_drag:float, securities_state:dict, last_date:str, last_row:list, cov_estimator:stat.covariance_estimator,
+                 bound=0.1, solver:str="numpy", target_weights:dict=None):
+        """
+        Daily update mode of the optimized portfolio. Each step takes one new day of prices and dividends, extends the total returns from each security's
+        last price and dividend reinvestment, adds the day to the covariance, drifts the benchmark and solves the target weights for the next day.
+        Only the state of the last day is kept, so a step costs O(n^2) in the number of assets no matter how long the history is.
+        Use live_pipeline.initialize to start from the market data files and live_pipeline.load to continue from a saved state.
+
+        :param benchmark_weights: dictionary of the universe of assets and their benchmark weights as of last_date. The last asset has to be cash.
+        :param cash_drag: cash drag constraint
+        :param securities_state: dictionary of ticker to its last_date, last_price and last_reinvestment, see stat.calc_returns_matrix(return_state=True)
+        :param last_date: last date that was added
+        :param last_row: returns of the last date, in the order of benchmark_weights. used when a security has no price on a date
+        :param cov_estimator: covariance estimator of the returns up to last_date
+        :param bound: assets cannot be over/under weight by more than this. a single value or a dictionary of per asset bounds
+        :param solver: solver backend, "numpy" or "cplex"
+        :param target_weights: optional, target weights of the last solve
+
+        Last Updated October 18, 2026
+        """
+
+        self.benchmark_weights = dict(benchmark_weights)
+        self.cash_drag = cash_drag
+        self.securities_state = securities_state
+        self.last_date = last_date
+        self.last_row = np.asarray(last_row, dtype=np.float64)
+        self.cov_estimator = cov_estimator
+        self.bound = bound
+        self.solver = solver
+        self.target_weights = target_weights
+
+        self.sec_list = list(self.benchmark_weights.keys())
+        self.optimizer = opt.ActiveRiskOptimizer(bound=bound, solver=solver)
+
+    @classmethod
+    def initialize(cls, benchmark_weights:dict, cash_drag:float, start_date:dt.datetime=None, end_date:dt.datetime=None, data_dir:str=stat.MARKET_DATA_DIR,
+                   cov_mode:str="expanding", window:int=None, halflife:float=None, bound=0.1, solver:str="numpy", source=None):
+        """
+        Starts the pipeline from the market data files. The covariance is fitted on the returns from start_date to end_date and the first target weights are solved.
+
+        :param benchmark_weights: dictionary of the universe of assets and their benchmark weights as of end_date. The last asset has to be cash.
+        :param cash_drag: cash drag constraint
+        :param start_date: first date of the returns used for the covariance. by default we go as far back as possible
+        :param end_date: last date of the returns. by default we look at data until today
+        :param data_dir: folder with the market data files
+        :param cov_mode: "expanding", "rolling" or "ewma", see stat.covariance_estimator
+        :param window: number of days of a rolling covariance
+        :param halflife: half-life in days of an ewma covariance
+        :param bound: assets cannot be over/under weight by more than this
+        :param solver: solver backend, "numpy" or "cplex"
+        :param source: optional, market data source, ie. market_data_lib.sql_source. by default the csv files in data_dir
+        :return: live_pipeline as of the last date of the market data
+        """
+
+        sec_list = list(benchmark_weights.keys())
+        tr_matrix, state = stat.calc_returns_matrix(sec_list=list(sec_list), start_date=start_date, end_date=end_date, data_dir=data_dir, return_state=True, source=source)
+        tr_matrix = tr_matrix[sec_list]
+
+        cov_estimator = stat.covariance_estimator(columns=sec_list, mode=cov_mode, window=window, halflife=halflife)
+        cov_estimator.fit(tr_matrix)
+
+        pipeline = cls(benchmark_weights, cash_drag, state["securities"], state["last_date"], tr_matrix.iloc[-1].to_numpy(dtype=np.float64), cov_estimator, bound=bound, solver=solver)
+        pipeline.solve()
+        return pipeline
+
+    def solve(self) -> dict:
+        """
+        :return: target weights that minimize the active risk against the current benchmark weights
+        """
+
+        self.target_weights = opt.minimize_active_risk(benchmark_portfolio=self.benchmark_weights, cash_drag=self.cash_drag, cov_matrix=self.cov_estimator, optimizer=self.optimizer)
+        return self.target_weights
+
+    @prof.timed("live_step")
+    def step(self, date, prices:dict, dividends:dict=None) -> dict:
+        """
+        Adds one day of market data and solves the target weights for the next day.
+
+        :param date: date of the prices. has to be after the last date
+        :param prices: dictionary of ticker to its PX_LAST on the date. a security without a price keeps the return of the last date
+        :param dividends: optional, dictionary of ticker to the dividend that goes ex on the date
+        :return: target weights for the next day
+        """
+
+        date = pd.Timestamp(date).strftime("%Y-%m-%d")
+        if date <= self.last_date:
+            raise ValueError(f"Error: {date} is not after the last date of the live pipeline {self.last_date}.")
+        dividends = {} if dividends is None else dividends
+
+        securities = [sec for sec in self.sec_list if sec != "cash"]
+        prior_prices = np.array([self.securities_state.get(sec, {}).get("last_price", np.nan) for sec in securities], dtype=np.float64)
+        prior_reinvestment = np.array([self.securities_state.get(sec, {}).get("last_reinvestment", np.nan) for sec in securities], dtype=np.float64)
+        day_prices = np.array([prices.get(sec, np.nan) for sec in securities], dtype=np.float64)
+        day_dividends = np.array([dividends.get(sec, np.nan) for sec in securities], dtype=np.float64)
+
+        # continue the total return of each security from its last price, the daily return is against its last total return price
+        dvd_reinvestment, total_return_price = stat.total_return_engine(day_prices[None, :], day_dividends[None, :], prior_prices, prior_reinvestment)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            sec_returns = (total_return_price[0] - (prior_prices + np.nan_to_num(prior_reinvestment))) / total_return_price[0]
+
+        row = self.last_row.copy()
+        for j, sec in enumerate(securities):
+            if np.isnan(day_prices[j]):
+                continue
+            self.securities_state[sec] = {"last_date": date, "last_price": float(day_prices[j]), "last_reinvestment": float(dvd_reinvestment[0, j])}
+            if not np.isnan(sec_returns[j]):
+                row[self.sec_list.index(sec)] = sec_returns[j]
+        if "cash" in self.sec_list:
+            row[self.sec_list.index("cash")] = 0
+
+        self.cov_estimator.update(row)
+
+        # the benchmark drifts with the returns of the day
+        _bench_wt = np.array([self.benchmark_weights[sec] for sec in self.sec_list], dtype=np.float64) * (1 + row)
+        self.benchmark_weights = dict(zip(self.sec_list, (_bench_wt / _bench_wt.sum()).tolist()))
+
+        self.last_date = date
+        self.last_row = row
+        return self.solve()
+
+    def ingest(self, price_rows:pd.DataFrame, dvd_rows:pd.DataFrame=None) -> pd.DataFrame:
+        """
+        Steps through every new date of the market data rows in order.
+
+        :param price_rows: DataFrame with the columns Dates, ticker and PX_LAST. dates on or before the last date are skipped
+        :param dvd_rows: optional, DataFrame with the columns ticker, ex_date and dvd_amount as in dividends.csv
+        :return: DataFrame of the target weights (dates x tickers) solved after each new date
+        """
+
+        price_rows = price_rows.assign(Dates=pd.to_datetime(price_rows["Dates"]).dt.strftime("%Y-%m-%d"))
+        price_rows = price_rows[price_rows["Dates"] > self.last_date]
+        dvd_by_date = {}
+        if dvd_rows is not None and not dvd_rows.empty:
+            ex_dates = pd.to_datetime(dvd_rows["ex_date"]).dt.strftime("%Y-%m-%d")
+            for ticker, ex_date, amount in zip(dvd_rows["ticker"], ex_dates, pd.to_numeric(dvd_rows["dvd_amount"])):
+                dvd_by_date.setdefault(ex_date, {})[ticker] = amount
+
+        targets = {}
+        for date, day_rows in price_rows.groupby("Dates", sort=True):
+            print(f"Live update for {date}")
+            targets[date] = self.step(date, dict(zip(day_rows["ticker"], day_rows["PX_LAST"])), dvd_by_date.get(date))
+        return pd.DataFrame.from_dict(targets, orient="index", columns=self.sec_list).rename_axis("Dates")
+
+    def save(self, state_dir:str) -> None:
+        """
+        Saves the state of the pipeline. The covariance arrays are stored in an npz file and everything else in a json file.
+        :param state_dir: folder of the saved state
+        """
+
+        os.makedirs(state_dir, exist_ok=True)
+        cov_state = self.cov_estimator.get_state()
+        cov_arrays = {k: v for k, v in cov_state.items() if isinstance(v, np.ndarray)}
+        state = {"benchmark_weights": self.benchmark_weights, "cash_drag": self.cash_drag, "securities_state": self.securities_state,
+                 "last_date": self.last_date, "last_row": self.last_row.tolist(), "bound": self.bound, "solver": self.solver,
+                 "target_weights": self.target_weights, "cov_estimator": {k: v for k, v in cov_state.items() if k not in cov_arrays}}
+
+        # write both files before replacing either so that a failed save leaves the previous state
+        arrays_fname = os.path.join(state_dir, ARRAYS_FNAME)
+        state_fname = os.path.join(state_dir, STATE_FNAME)
+        with open(arrays_fname + ".tmp", "wb") as f:
+            np.savez(f, **cov_arrays)
+        with open(state_fname + ".tmp", "w") as f:
+            json.dump(state, f, indent=1)
+        os.replace(arrays_fname + ".tmp", arrays_fname)
+        os.replace(state_fname + ".tmp", state_fname)
+
+    @classmethod
+    def load(cls, state_dir:str):
+        """
+        :param state_dir: folder of the saved state
+        :return: live_pipeline that continues from the saved state
+        """
+
+        state_fname = os.path.join(state_dir, STATE_FNAME)
+        if not os.path.isfile(state_fname):
+            raise ValueError(f"Error: No live state in {state_dir}. Please initialize the live pipeline first.")
+        with open(state_fname, "r") as f:
+            state = json.load(f)
+        with np.load(os.path.join(state_dir, ARRAYS_FNAME)) as cov_arrays:
+            cov_estimator = stat.covariance_estimator.from_state({**state["cov_estimator"], **{k: cov_arrays[k] for k in cov_arrays.files}})
+
+        return cls(state["benchmark_weights"], state["cash_drag"], state["securities_state"], state["last_date"], state["last_row"], cov_estimator,
+                   bound=state["bound"], solver=state["solver"], target_weights=state["target_weights"])
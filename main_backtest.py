@@ -1,9 +1,9 @@
 import statistics_lib as stat
-import optimization_lib as opt
+import validation_lib as val
+import walk_forward_lib as wf
 
 import datetime as dt
 import pandas as pd
-import numpy as np
 
 if __name__ == '__main__':
     training_start_period = "2018-11-16"
@@ -14,99 +14,43 @@ if __name__ == '__main__':
 
     _cash = 100/1e4
     df_returns_matrix = stat.calc_returns_matrix(sec_list=list(benchmark_wt.keys()), start_date=dt.datetime.strptime(training_start_period, "%Y-%m-%d"))
-
-    # backtest benchmark portfolio
-    bench = stat.calc_port_return(dates_list=pd.to_datetime(df_returns_matrix.loc[testing_start_period:].index), initial_ticker_weights=benchmark_wt, tr_matrix=df_returns_matrix)
-
-    # ----------------------------------------------------------------------------------------------------------
-    # backtest default no rebalance portfolio
-    default_portfolio_wt = {"BNS CN": (1-_cash)/6, "BMO CN": (1-_cash)/6, "TD CN": (1-_cash)/6, "CM CN": (1-_cash)/6, "RY CN": (1-_cash)/6, "NA CN": (1-_cash)/6, "cash": _cash}
-    default = stat.calc_port_return(dates_list=pd.to_datetime(df_returns_matrix.loc[testing_start_period:].index), initial_ticker_weights=default_portfolio_wt, tr_matrix=df_returns_matrix)
-
-    # default daily rebalance portfolio
-    default_rebal = pd.DataFrame()
-    dt_list = pd.to_datetime(df_returns_matrix.loc[testing_start_period:].index)
-    for idx, _d in enumerate(dt_list):
-        if _d == max(dt_list):
-            break
-        _sub_port = bench[bench["start_date"]==_d]
-        _daily_default_wt = dict(zip(_sub_port["ticker"], np.where(_sub_port["ticker"]=="cash", _cash, _sub_port["start_wt"] - (_cash/6))))
-
-        # daily rebalance, calculate the reuturn for each day and stack
-        if default_rebal.empty:
-            default_rebal = stat.calc_port_return(dates_list=[_d, dt_list[idx+1]], initial_ticker_weights=_daily_default_wt, tr_matrix=df_returns_matrix)
-        else:
-            default_rebal = pd.concat([default_rebal, stat.calc_port_return(dates_list=[_d, dt_list[idx+1]], initial_ticker_weights=_daily_default_wt, tr_matrix=df_returns_matrix)])
-
-    #----------------------------------------------------------------------------------------------------------
-    # Find the optimized portfolio to replicate the benchmark given the cash drag
-    # backtest optimized no rebalance
-    sol = opt.minimize_active_risk(benchmark_portfolio=benchmark_wt, cash_drag=_cash, tr_matrix=df_returns_matrix.loc[:training_end_period])
-    optimized = stat.calc_port_return(dates_list=pd.to_datetime(df_returns_matrix.loc[testing_start_period:].index), initial_ticker_weights=sol, tr_matrix=df_returns_matrix)
-
-    # backtest optimized daily rebalance
-    optimized_rebal = pd.DataFrame()
-    dt_list = pd.to_datetime(df_returns_matrix.loc[testing_start_period:].index)
-    for idx, _d in enumerate(dt_list):
-        if _d == max(dt_list):
-            break
-        _sub_port = bench[bench["start_date"]==_d]
-        _daily_bench_wt = dict(zip(_sub_port["ticker"], _sub_port["start_wt"]))
-
-        # trains with the most recent dataset
-        if _d == min(dt_list):
-            _daily_opt_basket = opt.minimize_active_risk(benchmark_portfolio=_daily_bench_wt, cash_drag=_cash, tr_matrix=df_returns_matrix.loc[:training_end_period])
-        else:
-            _daily_opt_basket = opt.minimize_active_risk(benchmark_portfolio=_daily_bench_wt, cash_drag=_cash, tr_matrix=df_returns_matrix.loc[:dt_list[idx-1].strftime("%Y-%m-%d")])
-
-        # daily rebalance, calculate the reuturn for each day and stack
-        if optimized_rebal.empty:
-            optimized_rebal = stat.calc_port_return(dates_list=[_d, dt_list[idx+1]], initial_ticker_weights=_daily_opt_basket, tr_matrix=df_returns_matrix)
-        else:
-            optimized_rebal = pd.concat([optimized_rebal, stat.calc_port_return(dates_list=[_d, dt_list[idx+1]], initial_ticker_weights=_daily_opt_basket, tr_matrix=df_returns_matrix)])
-
-    # ----------------------------------------------------------------------------------------------------------
-    # Sum up daily return
-    # sum optimized portfolio return
-    optimized["weighted_return"] = optimized["start_wt"]*optimized["period_return"]
-    optimized_port_returns = optimized.groupby(by=["start_date", "end_date"], group_keys=True)[["weighted_return"]].apply(sum).reset_index()
-
-    # sum optimized rebal portfolio return
-    optimized_rebal["weighted_return"] = optimized_rebal["start_wt"]*optimized_rebal["period_return"]
-    optimized_rebal_port_returns = optimized_rebal.groupby(by=["start_date", "end_date"], group_keys=True)[["weighted_return"]].apply(sum).reset_index()
-
-    # sum benchmark portfolio return
-    bench["weighted_return"] = bench["start_wt"]*bench["period_return"]
-    bench_port_returns = bench.groupby(by=["start_date", "end_date"], group_keys=True)[["weighted_return"]].apply(sum).reset_index()
-
-    # sum default portfolio return
-    default["weighted_return"] = default["start_wt"]*default["period_return"]
-    default_port_returns = default.groupby(by=["start_date", "end_date"], group_keys=True)[["weighted_return"]].apply(sum).reset_index()
-
-    # sum default rebal portfolio return
-    default_rebal["weighted_return"] = default_rebal["start_wt"]*default_rebal["period_return"]
-    default_rebal_port_returns = default_rebal.groupby(by=["start_date", "end_date"], group_keys=True)[["weighted_return"]].apply(sum).reset_index()
-
+    returns_matrix = stat.ReturnsMatrix.from_frame(df_returns_matrix)
+
+    # backtest the default and optimized portfolios, with and without a daily rebalance
+    backtests, details = wf.run_strategies(tr_matrix=returns_matrix, benchmark_weights=benchmark_wt, cash_drag=_cash, training_end=training_end_period, testing_start=testing_start_period)
+    default, default_std = backtests["default"]
+    default_rebal, default_rebal_std = backtests["default_rebal"]
+    optimized, optimized_std = backtests["optimized"]
+    optimized_rebal, optimized_rebal_std = backtests["optimized_rebal"]
+    default_portfolio_wt = details["default_weights"]
+    sol = details["optimized_weights"]
+    _solve_log = pd.DataFrame(details["solve_log"])
+    print(f"Optimizer: {len(_solve_log)} solves, average solve time {1e3*_solve_log['solve_time'].mean()}ms, status: {_solve_log['status'].value_counts().to_dict()}")
 
     # ----------------------------------------------------------------------------------------------------------
     # Consolidate and summarize the different portfolios
-    comparison = bench_port_returns[["start_date", "end_date"]]
-    comparison["bench"] = comparison["start_date"].map(dict(zip(bench_port_returns["start_date"], bench_port_returns["weighted_return"])))
+    comparison = default[["start_date", "end_date", "bench"]].copy()
     comparison["bench_cumprod"] = (1+comparison["bench"]).cumprod()-1
-    comparison["optimized"] = comparison["start_date"].map(dict(zip(optimized_port_returns["start_date"], optimized_port_returns["weighted_return"])))
+    comparison["optimized"] = optimized["portfolio"]
     comparison["optimized_cumprod"] = (1 + comparison["optimized"]).cumprod() - 1
-    comparison["optimized_rebal"] = comparison["start_date"].map(dict(zip(optimized_rebal_port_returns["start_date"], optimized_rebal_port_returns["weighted_return"])))
+    comparison["optimized_rebal"] = optimized_rebal["portfolio"]
     comparison["optimized_rebal_cumprod"] = (1 + comparison["optimized_rebal"]).cumprod() - 1
-    comparison["default"] = comparison["start_date"].map(dict(zip(default_port_returns["start_date"], default_port_returns["weighted_return"])))
+    comparison["default"] = default["portfolio"]
     comparison["default_cumprod"] = (1 + comparison["default"]).cumprod() - 1
-    comparison["default_rebal"] = comparison["start_date"].map(dict(zip(default_rebal_port_returns["start_date"], default_rebal_port_returns["weighted_return"])))
+    comparison["default_rebal"] = default_rebal["portfolio"]
     comparison["default_rebal_cumprod"] = (1 + comparison["default_rebal"]).cumprod() - 1
 
     # Analysis Statistics
-    print(f"Bench - Optimized Daily Std Dev: {1e4*(comparison['bench']-comparison['optimized']).std()}bps")
-    print(f"Bench - Optimized Rebal Daily Std Dev: {1e4 * (comparison['bench'] - comparison['optimized_rebal']).std()}bps")
-    print(f"Bench - Default Daily Std Dev: {1e4*(comparison['bench'] - comparison['default']).std()}bps")
-    print(f"Bench - Default Rebal Daily Std Dev: {1e4 * (comparison['bench'] - comparison['default_rebal']).std()}bps")
+    print(f"Bench - Optimized Daily Std Dev: {1e4*optimized_std}bps")
+    print(f"Bench - Optimized Rebal Daily Std Dev: {1e4*optimized_rebal_std}bps")
+    print(f"Bench - Default Daily Std Dev: {1e4*default_std}bps")
+    print(f"Bench - Default Rebal Daily Std Dev: {1e4*default_rebal_std}bps")
+
+    # Validate the ex-ante active risk of the training covariance against the realized active risk of bootstrapped testing paths
+    validation = val.validate_active_risk(tr_matrix=returns_matrix.window(start_date=testing_start_period), benchmark_weights=benchmark_wt,
+                                          portfolios={"default": default_portfolio_wt, "optimized": sol}, cov_matrix=returns_matrix.window(end_date=training_end_period).cov())
+    print("Ex-ante vs realized daily active risk (bps), 10,000 block bootstrap paths:")
+    print(pd.concat([1e4*validation.filter(like="risk").join(validation.filter(like="bootstrap")), validation.filter(like="bias"), validation[["band_coverage"]]], axis=1).to_string())
 
 
     # Graph Results
@@ -0,0 +1,51 @@
+import benchmark_lib as bench
+
+import os.path
+import json
+import argparse
+import pandas as pd
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Times the pipeline on synthetic universes of increasing size")
+    parser.add_argument("--tickers", type=int, nargs="+", default=[10, 100, 500], help="universe sizes, from 10 to 5000 tickers")
+    parser.add_argument("--years", type=float, nargs="+", default=[1, 5], help="years of data, from 1 to 25")
+    parser.add_argument("--full", action="store_true", help="run the full grid of 10, 100, 1000 and 5000 tickers over 1, 5 and 25 years")
+    parser.add_argument("--repeats", type=int, default=3, help="runs of each benchmark, the fastest is recorded")
+    parser.add_argument("--data-root", default=bench.BENCHMARK_DATA_DIR, help="folder of the synthetic market data")
+    parser.add_argument("--output", default=os.path.join(bench.BENCHMARK_DIR, "results.json"), help="json file of the results")
+    parser.add_argument("--baseline", default=os.path.join(bench.BENCHMARK_DIR, "baseline.json"), help="json file of the results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="also save the results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=1.25, help="ratio to the baseline time that is flagged as a regression")
+    parser.add_argument("--min-seconds", type=float, default=0.02, help="a regression also has to be this many seconds slower than the baseline, which ignores the timing noise of fast benchmarks")
+    args = parser.parse_args()
+
+    ticker_sizes, year_sizes = ([10, 100, 1000, 5000], [1, 5, 25]) if args.full else (args.tickers, args.years)
+    year_sizes = [int(num_years) if num_years == int(num_years) else num_years for num_years in year_sizes]
+
+    results = []
+    for num_years in year_sizes:
+        for num_tickers in ticker_sizes:
+            results += bench.run_benchmarks(num_tickers, num_years, data_root=args.data_root, repeats=args.repeats)
+
+    output = {"environment": bench.environment(), "results": results}
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=1)
+    print(f"Results written to {args.output}")
+
+    if os.path.isfile(args.baseline):
+        with open(args.baseline, "r") as f:
+            baseline = json.load(f)
+        comparison = bench.compare_to_baseline(results, baseline["results"], threshold=args.threshold, min_seconds=args.min_seconds)
+        pd.set_option("display.width", 200)
+        print(f"Compared to the baseline of {baseline['environment']['date']}:")
+        print(comparison.to_string(index=False))
+        if comparison["regression"].any():
+            print(f"Regressions: {comparison.loc[comparison['regression'], 'benchmark'].tolist()}")
+    elif not args.save_baseline:
+        print(f"No baseline at {args.baseline} to compare against. Run with --save-baseline to save these results as the baseline.")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(output, f, indent=1)
+        print(f"Baseline written to {args.baseline}")
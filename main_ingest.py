@@ -0,0 +1,17 @@
+import market_data_lib as mkt
+
+import sqlite3
+import argparse
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Bulk loads the csv market data files into a sqlite database")
+    parser.add_argument("--data-dir", default=mkt.MARKET_DATA_DIR, help="folder of the market data files")
+    parser.add_argument("--db", default="market_data.db", help="sqlite database file, created if it does not exist")
+    parser.add_argument("--tickers", nargs="+", default=None, help="Bloomberg tickers to ingest, ie. RY CN. by default every price file")
+    args = parser.parse_args()
+
+    conn = sqlite3.connect(args.db)
+    mkt.create_tables(conn)
+    rows = mkt.ingest_csv(conn, data_dir=args.data_dir, sec_list=args.tickers)
+    conn.close()
+    print(f"Ingested {rows['prices']} prices and {rows['dividends']} dividends into {args.db}")
@@ -0,0 +1,46 @@
+import statistics_lib as stat
+import market_data_lib as mkt
+import live_lib
+
+import os.path
+import argparse
+import datetime as dt
+import pandas as pd
+
+if __name__ == '__main__':
+    benchmark_wt = {"BNS CN": 1/6, "BMO CN": 1/6, "TD CN": 1/6, "CM CN": 1/6, "RY CN": 1/6, "NA CN": 1/6, "cash": 0}
+    _cash = 100/1e4
+
+    parser = argparse.ArgumentParser(description="Daily update of the optimized portfolio's target weights")
+    parser.add_argument("command", choices=["init", "update"], help="init builds the state from the market data files, update adds new days to the saved state")
+    parser.add_argument("--state-dir", default="live_state", help="folder of the saved state")
+    parser.add_argument("--data-dir", default=stat.MARKET_DATA_DIR, help="folder of the market data files (init)")
+    parser.add_argument("--db", default=None, help="sqlite database of the market data, see main_ingest.py. by default the files in --data-dir are read (init)")
+    parser.add_argument("--start-date", default="2018-11-16", help="first date of the returns used for the covariance (init)")
+    parser.add_argument("--end-date", default=None, help="last date of the returns, by default the last date of the market data (init)")
+    parser.add_argument("--cov-mode", default="expanding", choices=["expanding", "rolling", "ewma"], help="covariance estimator (init)")
+    parser.add_argument("--window", type=int, default=None, help="days in the rolling covariance window (init)")
+    parser.add_argument("--halflife", type=float, default=None, help="half-life in days of the ewma covariance (init)")
+    parser.add_argument("--solver", default="numpy", choices=["numpy", "cplex"], help="optimizer backend (init)")
+    parser.add_argument("--prices", help="csv of the new rows with the columns Dates, ticker and PX_LAST (update)")
+    parser.add_argument("--dividends", help="csv of the new dividends with the columns ticker, ex_date and dvd_amount (update)")
+    parser.add_argument("--output", help="csv that the target weights of each new date are appended to")
+    args = parser.parse_args()
+
+    if args.command == "init":
+        pipeline = live_lib.live_pipeline.initialize(benchmark_wt, _cash, start_date=dt.datetime.strptime(args.start_date, "%Y-%m-%d"),
+                                                     end_date=None if args.end_date is None else dt.datetime.strptime(args.end_date, "%Y-%m-%d"), data_dir=args.data_dir,
+                                                     cov_mode=args.cov_mode, window=args.window, halflife=args.halflife, solver=args.solver,
+                                                     source=None if args.db is None else mkt.sql_source.sqlite(args.db))
+        targets = pd.DataFrame([pipeline.target_weights], index=pd.Index([pipeline.last_date], name="Dates"))
+    else:
+        if args.prices is None:
+            parser.error("update needs --prices")
+        pipeline = live_lib.live_pipeline.load(args.state_dir)
+        targets = pipeline.ingest(pd.read_csv(args.prices), None if args.dividends is None else pd.read_csv(args.dividends))
+
+    pipeline.save(args.state_dir)
+    print(f"Target weights after {pipeline.last_date}:")
+    print(pd.Series(pipeline.target_weights))
+    if args.output is not None and not targets.empty:
+        targets.to_csv(args.output, mode="a", header=not os.path.isfile(args.output))
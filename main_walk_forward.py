@@ -0,0 +1,32 @@
+import statistics_lib as stat
+import walk_forward_lib as wf
+
+import datetime as dt
+import pandas as pd
+
+if __name__ == '__main__':
+    data_start_period = "2018-11-16"
+    training_days = 750
+    testing_days = 125
+    mode = "rolling"
+
+    benchmark_wt = {"BNS CN": 1/6, "BMO CN": 1/6, "TD CN": 1/6, "CM CN": 1/6, "RY CN": 1/6, "NA CN": 1/6, "cash": 0}
+
+    _cash = 100/1e4
+    df_returns_matrix = stat.calc_returns_matrix(sec_list=list(benchmark_wt.keys()), start_date=dt.datetime.strptime(data_start_period, "%Y-%m-%d"))
+    returns_matrix = stat.ReturnsMatrix.from_frame(df_returns_matrix)
+
+    # ----------------------------------------------------------------------------------------------------------
+    # Run every strategy on each walk forward fold
+    folds = wf.walk_forward_folds(returns_matrix.index, training_days=training_days, testing_days=testing_days, mode=mode)
+    results = wf.walk_forward(tr_matrix=returns_matrix, benchmark_weights=benchmark_wt, cash_drag=_cash, folds=folds)
+
+    # ----------------------------------------------------------------------------------------------------------
+    # Analysis Statistics
+    pd.set_option("display.width", 200)
+    print("Bench - Portfolio Daily Std Dev (bps) per fold:")
+    print((1e4*results.pivot(index="test_start", columns="strategy", values="active_std"))[wf.STRATEGIES])
+    print("Bench - Portfolio Daily Std Dev (bps) across folds:")
+    print((1e4*results.groupby("strategy")["active_std"].describe()).loc[wf.STRATEGIES, ["mean", "std", "min", "50%", "max"]])
+    print("Realized / ex-ante active risk across folds:")
+    print(results.dropna(subset=["bias_ratio"]).groupby("strategy")["bias_ratio"].describe()[["mean", "std", "min", "50%", "max"]])
@@ -0,0 +1,292 @@
+import os.path
+import sqlite3
+import datetime as dt
+import pandas as pd
+import profiling_lib as prof
+
+MARKET_DATA_DIR = "market_data"
+DIVIDEND_FNAME = "dividends.csv"
+PRICE_TABLE = "market_prices"
+DIVIDEND_TABLE = "dividends"
+PRICE_COLUMNS = ["ticker", "Dates", "PX_LAST"]
+DIVIDEND_COLUMNS = ["id", "gx_id", "ticker", "ex_date", "payable_date", "dvd_amount", "currency"]
+
+def _date_bounds(start_date:dt.datetime=None, end_date:dt.datetime=None) -> tuple:
+    """
+    :param start_date: first date to include. by default we go as far back as possible
+    :param end_date: last date to include. by default we look at data until today
+    :return: tuple of the first date to include (None if there is no start date) and the first date to exclude, as %Y-%m-%d strings.
+             A date column is within the range if first <= date < end. the same bounds work on date and datetime columns
+    """
+
+    _end_date = dt.datetime.now() if end_date is None else end_date
+    first_date = None if start_date is None else pd.Timestamp(start_date).ceil("D").strftime("%Y-%m-%d")
+    end_exclusive = (pd.Timestamp(_end_date).floor("D") + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+    return first_date, end_exclusive
+
+
+class csv_source():
+    def __init__(self, data_dir:str=MARKET_DATA_DIR):
+        """
+        Market data from the csv files: one file of Dates and PX_LAST per ticker, named after the ticker without the exchange (ie. RY.csv for RY CN),
+        and a dividends.csv file for the whole universe.
+
+        :param data_dir: folder with the market data files
+
+        Last Updated October 18, 2026
+        """
+
+        self.data_dir = data_dir
+
+    def price_fname(self, stock_ticker:str) -> str:
+        return os.path.join(self.data_dir, f"{stock_ticker.split(' ')[0]}.csv")
+
+    def dvd_fname(self) -> str:
+        return os.path.join(self.data_dir, DIVIDEND_FNAME)
+
+    def source_files(self, sec_list:list) -> list:
+        """
+        :param sec_list: list of securities
+        :return: list of the files the securities' market data is read from, used to check the returns matrix cache
+        """
+
+        return [self.price_fname(sec) for sec in sec_list if sec != "cash"] + [self.dvd_fname()]
+
+    def load_security_prices(self, stock_ticker:str, start_date:dt.datetime=None, end_date:dt.datetime=None) -> pd.DataFrame:
+        """
+        :param stock_ticker: Bloomberg ticker of the security: ie. AAPL US
+        :param start_date: the date where we want to begin looking at the data. by default we go as far back as possible
+        :param end_date: the date where we want to end looking at the data. by default we look at data until today
+        :return: market data (Dates and PX_LAST) for the security with the relevant timeframe
+        """
+
+        mkt_data_fname = self.price_fname(stock_ticker)
+        if not os.path.isfile(mkt_data_fname):
+            raise ValueError(f"Error: No Market Data available for: {stock_ticker.split(' ')[0]}")
+
+        market_data = pd.read_csv(mkt_data_fname)
+        # filter data so that it is within the specified range start_date/end_date
+        market_dates = pd.to_datetime(market_data["Dates"])
+        date_filter = market_dates <= (dt.datetime.now() if end_date is None else end_date)
+        if not start_date is None:
+            date_filter &= market_dates >= start_date
+        return market_data[date_filter]
+
+    @prof.timed("load_data")
+    def load_prices(self, sec_list:list, start_date:dt.datetime=None, end_date:dt.datetime=None) -> dict:
+        """
+        :param sec_list: list of securities
+        :param start_date: the date where we want to begin looking at the data. by default we go as far back as possible
+        :param end_date: the date where we want to end looking at the data. by default we look at data until today
+        :return: dictionary of each security to its market data (Dates and PX_LAST) sorted by date
+        """
+
+        securities = [sec for sec in sec_list if sec != "cash"]
+        sec_prices = {}
+        for count, sec in enumerate(securities):
+            print(f"Loading data for {sec}: {count+1}/{len(securities)}")
+            sec_prices[sec] = self.load_security_prices(sec, start_date, end_date)
+        return sec_prices
+
+    @prof.timed("load_data")
+    def load_dividends(self, sec_list:list=None, start_date:dt.datetime=None, end_date:dt.datetime=None) -> pd.DataFrame:
+        """
+        :param sec_list: optional, list of securities. by default the dividends of every ticker
+        :param start_date: optional, first ex-date. by default we go as far back as possible
+        :param end_date: optional, last ex-date. by default every ex-date in the file, including the ones that have not gone ex yet
+        :return: dividend rows with the columns of dividends.csv
+        """
+
+        dvd_data_fname = self.dvd_fname()
+        if not os.path.isfile(dvd_data_fname):
+            raise ValueError(f"Error: Dividend File does not exist.")
+        dvd_data = pd.read_csv(dvd_data_fname)
+
+        if sec_list is not None:
+            dvd_data = dvd_data[dvd_data["ticker"].isin(sec_list)]
+        if start_date is not None or end_date is not None:
+            first_date, end_exclusive = _date_bounds(start_date, end_date)
+            ex_dates = pd.to_datetime(dvd_data["ex_date"])
+            date_filter = ex_dates < end_exclusive
+            if first_date is not None:
+                date_filter &= ex_dates >= first_date
+            dvd_data = dvd_data[date_filter]
+        return dvd_data
+
+    def tickers(self) -> list:
+        """
+        :return: list of the tickers with a price file. The exchange is taken from the dividends file where the ticker has dividends,
+                 otherwise the ticker is the file name
+        """
+
+        dvd_tickers = {}
+        if os.path.isfile(self.dvd_fname()):
+            dvd_tickers = {ticker.split(" ")[0]: ticker for ticker in pd.read_csv(self.dvd_fname(), usecols=["ticker"])["ticker"].dropna().unique()}
+        file_tickers = sorted(os.path.splitext(fname)[0] for fname in os.listdir(self.data_dir) if fname.endswith(".csv") and fname != DIVIDEND_FNAME)
+        return [dvd_tickers.get(ticker, ticker) for ticker in file_tickers]
+
+
+class sql_source():
+    def __init__(self, conn, price_table:str=PRICE_TABLE, dvd_table:str=DIVIDEND_TABLE, chunksize:int=100000, batch_size:int=1000):
+        """
+        Market data from a database, ie. the pyodbc connection of common.db_connection or a local sqlite3 connection.
+        The prices of the whole universe are read in one query over the date range rather than one query per ticker, and the rows are streamed
+        in chunks so a large universe is never held as one result set. The tables have the columns of the csv files:
+            price_table: ticker, Dates, PX_LAST (one row per ticker and date, ticker is the Bloomberg ticker ie. RY CN)
+            dvd_table: id, gx_id, ticker, ex_date, payable_date, dvd_amount, currency
+
+        :param conn: DB-API connection with the qmark (?) parameter style
+        :param price_table: name of the price table
+        :param dvd_table: name of the dividend table
+        :param chunksize: number of rows fetched at a time
+        :param batch_size: maximum number of tickers in the IN list of one query, larger universes are split into batches.
+                           SQL Server allows about 2100 parameters per query
+
+        Last Updated October 18, 2026
+        """
+
+        self.conn = conn
+        self.price_table = price_table
+        self.dvd_table = dvd_table
+        self.chunksize = chunksize
+        self.batch_size = batch_size
+
+    @classmethod
+    def sqlite(cls, db_fname:str, **kwargs):
+        """
+        :param db_fname: sqlite database file, ie. one written by ingest_csv
+        :return: sql_source of the database
+        """
+
+        if not os.path.isfile(db_fname):
+            raise ValueError(f"Error: Database {db_fname} does not exist. Please ingest the market data first.")
+        return cls(sqlite3.connect(db_fname), **kwargs)
+
+    def _read_chunks(self, sql_query:str, params:list):
+        return pd.read_sql_query(sql_query, self.conn, params=params, chunksize=self.chunksize)
+
+    def _query(self, table:str, columns:list, date_col:str, sec_list:list, start_date:dt.datetime, end_date:dt.datetime, date_filter:bool=True):
+        """
+        Streams the rows of the securities in batches of batch_size tickers
+        :return: generator of DataFrame chunks sorted by ticker and date within each batch
+        """
+
+        first_date, end_exclusive = _date_bounds(start_date, end_date)
+        for first in range(0, len(sec_list), self.batch_size):
+            batch = sec_list[first:first + self.batch_size]
+            sql_query = f"SELECT {', '.join(columns)} FROM {table} WHERE ticker IN ({', '.join('?'*len(batch))})"
+            params = list(batch)
+            if date_filter:
+                sql_query += f" AND {date_col} < ?"
+                params.append(end_exclusive)
+                if first_date is not None:
+                    sql_query += f" AND {date_col} >= ?"
+                    params.append(first_date)
+            yield from self._read_chunks(sql_query + f" ORDER BY ticker, {date_col}", params)
+
+    @prof.timed("load_data")
+    def load_prices(self, sec_list:list, start_date:dt.datetime=None, end_date:dt.datetime=None) -> dict:
+        """
+        :param sec_list: list of securities
+        :param start_date: the date where we want to begin looking at the data. by default we go as far back as possible
+        :param end_date: the date where we want to end looking at the data. by default we look at data until today
+        :return: dictionary of each security to its market data (Dates and PX_LAST) sorted by date
+        """
+
+        securities = [sec for sec in sec_list if sec != "cash"]
+        print(f"Loading data for {len(securities)} securities from {self.price_table}")
+        sec_chunks = {}
+        for chunk in self._query(self.price_table, PRICE_COLUMNS, "Dates", securities, start_date, end_date):
+            # a ticker can span two chunks
+            chunk["Dates"] = pd.to_datetime(chunk["Dates"]).dt.strftime("%Y-%m-%d")
+            for ticker, rows in chunk.groupby("ticker", sort=False):
+                sec_chunks.setdefault(ticker, []).append(rows[["Dates", "PX_LAST"]])
+
+        missing = [sec for sec in securities if sec not in sec_chunks]
+        if missing:
+            raise ValueError(f"Error: No Market Data available for: {', '.join(missing)}")
+        return {sec: pd.concat(sec_chunks[sec], ignore_index=True) for sec in securities}
+
+    @prof.timed("load_data")
+    def load_dividends(self, sec_list:list=None, start_date:dt.datetime=None, end_date:dt.datetime=None) -> pd.DataFrame:
+        """
+        :param sec_list: optional, list of securities. by default the dividends of every ticker
+        :param start_date: optional, first ex-date. by default we go as far back as possible
+        :param end_date: optional, last ex-date. by default every ex-date in the table, including the ones that have not gone ex yet
+        :return: dividend rows with the columns of dividends.csv
+        """
+
+        date_filter = start_date is not None or end_date is not None
+        if sec_list is None:
+            sec_list = self.tickers(self.dvd_table)
+        chunks = list(self._query(self.dvd_table, DIVIDEND_COLUMNS, "ex_date", [sec for sec in sec_list if sec != "cash"], start_date, end_date, date_filter))
+        if not chunks:
+            return pd.DataFrame(columns=DIVIDEND_COLUMNS)
+        return pd.concat(chunks, ignore_index=True)
+
+    def tickers(self, table:str=None) -> list:
+        """
+        :param table: optional, table to list. by default the price table
+        :return: sorted list of the tickers in the table
+        """
+
+        return pd.read_sql_query(f"SELECT DISTINCT ticker FROM {self.price_table if table is None else table} ORDER BY ticker", self.conn)["ticker"].tolist()
+
+
+def create_tables(conn, price_table:str=PRICE_TABLE, dvd_table:str=DIVIDEND_TABLE) -> None:
+    """
+    Creates the market data tables and their (ticker, date) indexes in a sqlite database if they do not exist yet.
+    The production tables already exist, this is for the local sqlite copy.
+
+    :param conn: sqlite3 connection
+    :param price_table: name of the price table
+    :param dvd_table: name of the dividend table
+    """
+
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {price_table} (ticker TEXT NOT NULL, Dates TEXT NOT NULL, PX_LAST REAL, PRIMARY KEY (ticker, Dates))")
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {dvd_table} (id INTEGER PRIMARY KEY, gx_id TEXT, ticker TEXT NOT NULL, ex_date TEXT NOT NULL, payable_date TEXT, dvd_amount REAL, currency TEXT)")
+    conn.execute(f"CREATE INDEX IF NOT EXISTS {dvd_table}_ticker_ex_date ON {dvd_table} (ticker, ex_date)")
+    conn.commit()
+
+
+def _sql_rows(df:pd.DataFrame) -> list:
+    # NaN is inserted as NULL
+    return list(df.astype(object).where(df.notna(), None).itertuples(index=False, name=None))
+
+
+def ingest_csv(conn, data_dir:str=MARKET_DATA_DIR, sec_list:list=None, price_table:str=PRICE_TABLE, dvd_table:str=DIVIDEND_TABLE) -> dict:
+    """
+    Bulk loads the csv market data files into the price and dividend tables. The existing rows of every ingested ticker are replaced,
+    so the files can be ingested again after they are updated.
+
+    :param conn: DB-API connection with the qmark (?) parameter style. the tables have to exist, see create_tables
+    :param data_dir: folder with the market data files
+    :param sec_list: optional, list of securities to ingest. by default every price file, see csv_source.tickers
+    :param price_table: name of the price table
+    :param dvd_table: name of the dividend table
+    :return: dictionary of the number of price and dividend rows inserted
+
+    Last Updated October 18, 2026
+    """
+
+    source = csv_source(data_dir)
+    securities = source.tickers() if sec_list is None else [sec for sec in sec_list if sec != "cash"]
+    cursor = conn.cursor()
+
+    num_prices = 0
+    for count, sec in enumerate(securities):
+        print(f"Ingesting prices for {sec}: {count+1}/{len(securities)}")
+        market_data = pd.read_csv(source.price_fname(sec))
+        market_data = market_data.assign(ticker=sec, Dates=pd.to_datetime(market_data["Dates"]).dt.strftime("%Y-%m-%d"))
+        cursor.execute(f"DELETE FROM {price_table} WHERE ticker = ?", [sec])
+        cursor.executemany(f"INSERT INTO {price_table} ({', '.join(PRICE_COLUMNS)}) VALUES ({', '.join('?'*len(PRICE_COLUMNS))})", _sql_rows(market_data[PRICE_COLUMNS]))
+        num_prices += len(market_data)
+
+    dvd_data = source.load_dividends(securities).reindex(columns=DIVIDEND_COLUMNS)
+    print(f"Ingesting {len(dvd_data)} dividends")
+    cursor.executemany(f"DELETE FROM {dvd_table} WHERE ticker = ?", [[sec] for sec in securities])
+    if dvd_data["id"].isna().any():
+        dvd_data = dvd_data.drop(columns="id")
+    cursor.executemany(f"INSERT INTO {dvd_table} ({', '.join(dvd_data.columns)}) VALUES ({', '.join('?'*len(dvd_data.columns))})", _sql_rows(dvd_data))
+    conn.commit()
+    return {"prices": num_prices, "dividends": len(dvd_data)}
@@ -3,72 +3,575 @@ import datetime as dt
 import pandas as pd
 import numpy as np
 import math
-import cplex
+import time
 import copy
+import abc
+import concurrent.futures
+import statistics_lib as stat
+import factor_model_lib as fm
+import profiling_lib as prof
 
-def minimize_active_risk(benchmark_portfolio:dict, cash_drag:float, tr_matrix:pd.DataFrame) -> dict:
+try:
+    import cplex
+except ImportError:
+    cplex = None
+
+QUADRATIC_SCALE = 1e9 #default tolerance is set to 1e6. we need to increase the quadratic problem to optimize on a higher tolerance level.
+
+class qp_backend(abc.ABC):
+    """
+    Solver backend interface for the active risk problem:
+                     min z = xCx
+       subject to:      lower_bounds <= x <= upper_bounds
+                        sum(x) = 0
+                        cash > [cash_drag]   (the last asset is cash)
+    """
+
+    @abc.abstractmethod
+    def solve(self, sec_list:list, cov_matrix, cash_drag:float, lower_bounds:np.ndarray, upper_bounds:np.ndarray) -> tuple:
         """
-        ============================================================
-        This file gives us a sample to use Cplex Python API to
-        establish a Quadratic Programming model and then solve it.
-        The Quadratic Programming problem displayed below is as:
-                         min z = xCx
-           subject to:      cash > [cash_drag]
-        ============================================================
-        :param benchmark_portfolio: dictionary of the universe of assets that we can use to optimize and their weights represented in the benchmark_portfolio. The last asset has to be cash.
+        :param sec_list: list of the universe of assets. The last asset has to be cash.
+        :param cov_matrix: covariance matrix array, or fm.factor_model, in the order of sec_list
         :param cash_drag: cash drag constraint
-        :param tr_matrix: returns matrix of the universe of assets
-        :return:
+        :param lower_bounds: array of the lower bound of each active weight
+        :param upper_bounds: array of the upper bound of each active weight
+        :return: tuple of the active weights array and the solve status
         """
 
-        sec_list = list(benchmark_portfolio.keys())
 
-        # Input all the data and parameters here
-        num_decision_var = len(benchmark_portfolio)
+class cplex_qp_backend(qp_backend):
+    def __init__(self, log_output:bool=False, warm_start:bool=True):
+        """
+        Cplex backend. The model is built once for a universe of assets, later solves only update the quadratic coefficients, right hand sides and bounds
+        that changed, and start from the previous solution.
+        With a fm.factor_model the QP is formulated with k auxiliary factor exposure variables y = B'x, min y'Fy + x'Dx, so the model has n*k
+        coefficients instead of n*n.
 
-        # Establish the Linear Programming Model
-        myProblem = cplex.Cplex()
+        :param log_output: if True the Cplex log is printed to stdout
+        :param warm_start: if True each solve starts from the previous solution. the QP is solved with the primal simplex so that the start is used
 
-        # Add the decision variables and set their lower bound and upper bound (if necessary)
-        _names = ["w"+str(i) for i in sec_list]
+        Last Updated October 18, 2026
+        """
+
+        if cplex is None:
+            raise ImportError("Error: The cplex package is not installed. Please use the numpy solver.")
+
+        self.log_output = log_output
+        self.warm_start = warm_start
+
+        self.model = None
+        self.sec_list = None
+        self._num_factors = None
+        self._qmat = None
+        self._loadings = None
+        self._factor_cov = None
+        self._specific_var = None
+        self._cash_drag = None
+        self._lower_bounds = None
+        self._upper_bounds = None
+        self._solution = None
+
+    @prof.timed("model_build")
+    def _build(self, sec_list:list, cov_matrix, lower_bounds:np.ndarray, upper_bounds:np.ndarray) -> None:
+        """
+        Establish the Quadratic Programming model for a universe of assets
+        """
 
-        #add constrainst where assets cannot be over/under weight by 10%
-        bound = 0.1
-        myProblem.variables.add(ub=[bound]*num_decision_var, lb=[-bound]*num_decision_var, names=_names)
+        num_decision_var = len(sec_list)
+        self.model = cplex.Cplex()
+        if not self.log_output:
+            self.model.set_log_stream(None)
+            self.model.set_results_stream(None)
+            self.model.set_warning_stream(None)
+        if self.warm_start:
+            self.model.parameters.qpmethod.set(self.model.parameters.qpmethod.values.primal)
+        self.model.objective.set_sense(self.model.objective.sense.minimize)
+
+        # Add the decision variables and set their lower bound and upper bound
+        _names = ["w"+str(i) for i in sec_list]
+        self.model.variables.add(ub=upper_bounds.tolist(), lb=lower_bounds.tolist(), names=_names)
 
         # Add constraints
         _constraint1_var = [0]*(num_decision_var-1)
         _constraint1_var += [1] # assume the last asset is cash
 
         constraint_rows = [[_names, _constraint1_var], [_names, [1]*num_decision_var]]
-        myProblem.linear_constraints.add(
+        self.model.linear_constraints.add(
                 lin_expr=constraint_rows,
-                rhs=[cash_drag, 0],
+                rhs=[0, 0],
                 names=["c{0}".format(i+1) for i in range(2)],
                 senses=["G", "E"]
                 )
 
-        qmat = []
+        if isinstance(cov_matrix, fm.factor_model):
+            # factor exposure variables y = B'x. the objective is y'Fy + x'Dx
+            num_factors = cov_matrix.num_factors
+            _factor_names = ["f"+str(f) for f in range(num_factors)]
+            self.model.variables.add(ub=[cplex.infinity]*num_factors, lb=[-cplex.infinity]*num_factors, names=_factor_names)
+            self.model.linear_constraints.add(
+                    lin_expr=[[_names + [_factor_names[f]], cov_matrix.loadings[:, f].tolist() + [-1]] for f in range(num_factors)],
+                    rhs=[0]*num_factors,
+                    names=["e"+str(f) for f in range(num_factors)],
+                    senses=["E"]*num_factors
+                    )
+            _factor_vars = list(range(num_decision_var, num_decision_var + num_factors))
+            self.model.objective.set_quadratic([[[j], [QUADRATIC_SCALE*d]] for j, d in enumerate(cov_matrix.specific_var)] +
+                                               [[_factor_vars, (QUADRATIC_SCALE*row_f).tolist()] for row_f in cov_matrix.factor_cov])
+            self._num_factors = num_factors
+            self._qmat = None
+            self._loadings = cov_matrix.loadings
+            self._factor_cov = QUADRATIC_SCALE*cov_matrix.factor_cov
+            self._specific_var = QUADRATIC_SCALE*cov_matrix.specific_var
+        else:
+            qmat = QUADRATIC_SCALE*cov_matrix
+            self.model.objective.set_quadratic([[list(range(num_decision_var)), row_q.tolist()] for row_q in qmat])
+            self._num_factors = None
+            self._qmat = qmat
 
-        # calculate covariance matrix with returns
-        cov_matrix = tr_matrix.cov()
-        for row_cov in cov_matrix.values:
-            qmat.append([[j for j in range(num_decision_var)], 1e9*row_cov]) #default tolerance is set to 1e6. we need to increase the quadratic problem to optimize on a higher tolerance level.
-        myProblem.objective.set_quadratic(qmat)
+        self.sec_list = sec_list
+        self._cash_drag = 0
+        self._lower_bounds = lower_bounds
+        self._upper_bounds = upper_bounds
+        self._solution = None
 
-        # Solve the model and print the answer
-        myProblem.solve()
-        myProblem.objective.set_sense(myProblem.objective.sense.minimize)
+    def _update_factor_model(self, cov_matrix:fm.factor_model) -> None:
+        """
+        Updates the loadings, factor covariance and specific variances that changed
+        """
 
-        # objective_value = myProblem.solution.get_objective_value()
-        solution_value = myProblem.solution.get_values()
+        num_decision_var = len(self.sec_list)
+        changed_i, changed_f = np.nonzero(cov_matrix.loadings != self._loadings)
+        if len(changed_i) > 0:
+            self.model.linear_constraints.set_coefficients(list(zip((changed_f + 2).tolist(), changed_i.tolist(), cov_matrix.loadings[changed_i, changed_f].tolist())))
+            self._loadings = cov_matrix.loadings
 
-        solution_output = {}
-        for j, col in enumerate(tr_matrix.columns):
-                solution_output[col] = solution_value[j] + benchmark_portfolio.get(col)
+        factor_cov = QUADRATIC_SCALE*cov_matrix.factor_cov
+        changed_f, changed_g = np.nonzero(np.triu(factor_cov != self._factor_cov))
+        specific_var = QUADRATIC_SCALE*cov_matrix.specific_var
+        changed_j = np.flatnonzero(specific_var != self._specific_var)
+        if len(changed_f) > 0 or len(changed_j) > 0:
+            self.model.objective.set_quadratic_coefficients(
+                    list(zip((changed_f + num_decision_var).tolist(), (changed_g + num_decision_var).tolist(), factor_cov[changed_f, changed_g].tolist())) +
+                    list(zip(changed_j.tolist(), changed_j.tolist(), specific_var[changed_j].tolist())))
+            self._factor_cov = factor_cov
+            self._specific_var = specific_var
+
+    def solve(self, sec_list:list, cov_matrix, cash_drag:float, lower_bounds:np.ndarray, upper_bounds:np.ndarray) -> tuple:
+        num_factors = cov_matrix.num_factors if isinstance(cov_matrix, fm.factor_model) else None
+
+        if self.model is None or sec_list != self.sec_list or num_factors != self._num_factors:
+            self._build(sec_list, cov_matrix, lower_bounds, upper_bounds)
+        else:
+            if num_factors is not None:
+                self._update_factor_model(cov_matrix)
+            else:
+                # only update the quadratic coefficients that changed. each coefficient sets both (i, j) and (j, i)
+                qmat = QUADRATIC_SCALE*cov_matrix
+                changed_i, changed_j = np.nonzero(np.triu(qmat != self._qmat))
+                if len(changed_i) > 0:
+                    self.model.objective.set_quadratic_coefficients(list(zip(changed_i.tolist(), changed_j.tolist(), qmat[changed_i, changed_j].tolist())))
+                    self._qmat = qmat
+
+            changed_lb = np.flatnonzero(lower_bounds != self._lower_bounds)
+            if len(changed_lb) > 0:
+                self.model.variables.set_lower_bounds(list(zip(changed_lb.tolist(), lower_bounds[changed_lb].tolist())))
+                self._lower_bounds = lower_bounds
+            changed_ub = np.flatnonzero(upper_bounds != self._upper_bounds)
+            if len(changed_ub) > 0:
+                self.model.variables.set_upper_bounds(list(zip(changed_ub.tolist(), upper_bounds[changed_ub].tolist())))
+                self._upper_bounds = upper_bounds
+
+        if cash_drag != self._cash_drag:
+            self.model.linear_constraints.set_rhs("c1", cash_drag)
+            self._cash_drag = cash_drag
+
+        if self.warm_start and self._solution is not None:
+            if num_factors is not None:
+                # the factor exposures of the previous weights under the current loadings
+                _active_wt = np.asarray(self._solution[:len(sec_list)])
+                self._solution = _active_wt.tolist() + (cov_matrix.loadings.T @ _active_wt).tolist()
+            self.model.start.set_start(col_status=[], row_status=[], col_primal=self._solution, row_primal=[], col_dual=[], row_dual=[])
+
+        self.model.solve()
+        self._solution = self.model.solution.get_values()
+        return np.asarray(self._solution[:len(sec_list)]), self.model.solution.get_status_string()
+
+
+class numpy_qp_backend(qp_backend):
+    def __init__(self, log_output:bool=False, warm_start:bool=True, tol:float=1e-12, max_iter:int=None):
+        """
+        Pure NumPy backend. The cash drag is folded into the lower bound of cash so the problem is a box constrained QP with one equality,
+        which is solved exactly with a primal active-set method: each iteration solves the equality constrained problem on the free assets
+        and either steps to the first bound that blocks, or releases the bound with the most negative multiplier.
+
+        :param log_output: if True the iterations of each solve are printed
+        :param warm_start: if True each solve starts from the previous solution and its active bounds
+        :param tol: convergence tolerance of the step and the multipliers, relative to the covariance scale
+        :param max_iter: maximum number of active-set iterations. by default 10 times the number of assets plus 100
+
+        Last Updated October 18, 2026
+        """
+
+        self.log_output = log_output
+        self.warm_start = warm_start
+        self.tol = tol
+        self.max_iter = max_iter
+
+        self.sec_list = None
+        self._active_wt = None
+
+    def solve(self, sec_list:list, cov_matrix, cash_drag:float, lower_bounds:np.ndarray, upper_bounds:np.ndarray) -> tuple:
+        lower_bounds = lower_bounds.copy()
+        lower_bounds[-1] = max(lower_bounds[-1], cash_drag) # assume the last asset is cash
+
+        x0 = self._active_wt if (self.warm_start and sec_list == self.sec_list) else None
+        active_wt, status = solve_active_risk_qp(cov_matrix, lower_bounds, upper_bounds, x0=x0, tol=self.tol, max_iter=self.max_iter, log_output=self.log_output)
+
+        self.sec_list = sec_list
+        self._active_wt = active_wt
+        return active_wt, status
+
+
+SOLVER_BACKENDS = {"numpy": numpy_qp_backend, "cplex": cplex_qp_backend}
+
+def is_feasible(lower_bounds:np.ndarray, upper_bounds:np.ndarray, cash_drag:float=None) -> bool:
+    """
+    :param lower_bounds: array of the lower bound of each active weight
+    :param upper_bounds: array of the upper bound of each active weight
+    :param cash_drag: optional, cash drag constraint on the last asset (cash)
+    :return: True if some active weights within the bounds sum to 0
+    """
+
+    if cash_drag is not None:
+        lower_bounds = lower_bounds.copy()
+        lower_bounds[-1] = max(lower_bounds[-1], cash_drag)
+    return not (lower_bounds.sum() > 0 or upper_bounds.sum() < 0 or np.any(lower_bounds > upper_bounds))
+
+
+def project_to_feasible(x:np.ndarray, lower_bounds:np.ndarray, upper_bounds:np.ndarray) -> np.ndarray:
+    """
+    Euclidean projection onto {lower_bounds <= x <= upper_bounds, sum(x) = 0}. The projection is clip(x - tau) where the shift tau is found by bisection.
+
+    :param x: array to project
+    :param lower_bounds: array of lower bounds
+    :param upper_bounds: array of upper bounds
+    :return: the closest feasible array
+    """
+
+    if not is_feasible(lower_bounds, upper_bounds):
+        raise ValueError("Error: The bounds and the cash drag leave no feasible portfolio.")
+
+    tau_low = np.min(x - upper_bounds)
+    tau_high = np.max(x - lower_bounds)
+    for _ in range(200):
+        tau = 0.5*(tau_low + tau_high)
+        if np.clip(x - tau, lower_bounds, upper_bounds).sum() > 0:
+            tau_low = tau
+        else:
+            tau_high = tau
+        if tau_high - tau_low <= 1e-16*max(1.0, abs(tau)):
+            break
+    projected = np.clip(x - 0.5*(tau_low + tau_high), lower_bounds, upper_bounds)
+
+    # spread the remaining rounding error over the assets that are not at a bound
+    free = (projected > lower_bounds) & (projected < upper_bounds)
+    if free.any():
+        projected[free] -= projected.sum() / free.sum()
+    return projected
+
+
+def portfolio_variance(cov_matrix, x:np.ndarray) -> float:
+    """
+    :param cov_matrix: covariance matrix array or fm.factor_model
+    :param x: array of weights
+    :return: the variance x'Cx
+    """
+
+    if isinstance(cov_matrix, fm.factor_model):
+        return cov_matrix.variance(x)
+    return float(x.dot(cov_matrix).dot(x))
+
+
+def _kkt_step(cov_matrix, free:np.ndarray, gradient:np.ndarray, max_step:float=np.inf) -> tuple:
+    """
+    Solves the equality constrained step on the free assets, C_ff p + lambda = -g_f, sum(p) = 0.
+    When the system is singular, or its solution is longer than max_step because it is close to singular, the minimum norm least squares
+    solution is used instead, which drops the directions of no risk that would only add rounding error to the step.
+    :param max_step: the largest useful step of an asset, ie. the widest bound
+    :return: tuple of the step of the free assets and the multiplier lambda of the sum to zero constraint
+    """
+
+    num_free = int(free.sum())
+    if isinstance(cov_matrix, fm.factor_model):
+        free_loadings = cov_matrix.loadings[free]
+        free_specific = cov_matrix.specific_var[free]
+        zero_curvature = (free_specific <= 0) & ~np.any(free_loadings != 0, axis=1)
+        curved = ~zero_curvature
+        if np.all(free_specific[curved] > 0):
+            curved_rows = np.flatnonzero(free)[curved]
+            step = np.zeros(num_free)
+            if zero_curvature.any():
+                # assets with no risk (ie. cash) have a zero gradient so lambda is 0. they take up the sum of the step of the other free assets
+                if curved.any():
+                    step[curved] = -cov_matrix.inverse_matvec(gradient[curved_rows], rows=curved_rows)
+                step[zero_curvature] = -step[curved].sum() / zero_curvature.sum()
+                return step, 0.0
+            solved = cov_matrix.inverse_matvec(np.column_stack([gradient[curved_rows], np.ones(num_free)]), rows=curved_rows)
+            multiplier = -solved[:, 0].sum() / solved[:, 1].sum()
+            return -(solved[:, 0] + multiplier*solved[:, 1]), multiplier
+        # the Woodbury identity needs positive specific variances. build the dense covariance of the free assets instead
+        cov_free = free_loadings @ cov_matrix.factor_cov @ free_loadings.T + np.diag(free_specific)
+    else:
+        cov_free = cov_matrix[np.ix_(free, free)]
+
+    kkt = np.zeros((num_free + 1, num_free + 1))
+    kkt[:num_free, :num_free] = cov_free
+    kkt[:num_free, num_free] = 1
+    kkt[num_free, :num_free] = 1
+    rhs = np.append(-gradient[free], 0)
+    try:
+        kkt_solution = np.linalg.solve(kkt, rhs)
+    except np.linalg.LinAlgError:
+        kkt_solution = None
+    if kkt_solution is None or not np.abs(kkt_solution[:num_free]).max() <= max_step:
+        # scale the covariance block to a unit diagonal so the rank cutoff separates the directions of no risk from the ones of small risk
+        scale = max(np.abs(np.diag(cov_free)).max(), np.finfo(np.float64).tiny)
+        kkt[:num_free, :num_free] /= scale
+        kkt_solution = np.linalg.lstsq(kkt, rhs / scale, rcond=1e3*np.finfo(np.float64).eps*num_free)[0]
+        kkt_solution[num_free] *= scale
+    return kkt_solution[:num_free], kkt_solution[num_free]
+
+
+def solve_active_risk_qp(cov_matrix, lower_bounds:np.ndarray, upper_bounds:np.ndarray, x0:np.ndarray=None, tol:float=1e-12, max_iter:int=None, log_output:bool=False) -> tuple:
+    """
+    Primal active-set solver for min xCx subject to lower_bounds <= x <= upper_bounds and sum(x) = 0.
+    A step that does not lower the risk by more than the rounding error (ie. along the null space of a singular covariance matrix when there are
+    fewer days than assets) is treated as a zero step. While the iterations make no progress the bound to release is chosen by Bland's rule,
+    the smallest index with a violated multiplier, and a bound that was released and then blocks a zero length step is kept until the solution
+    moves, so the active set cannot cycle.
+
+    :param cov_matrix: covariance matrix array, or a fm.factor_model in which case each iteration costs O(nk^2) and the dense matrix is never built
+    :param lower_bounds: array of lower bounds
+    :param upper_bounds: array of upper bounds
+    :param x0: optional, starting point. projected onto the feasible set
+    :param tol: convergence tolerance of the step and the multipliers, relative to the covariance scale
+    :param max_iter: maximum number of iterations. by default 10 times the number of assets plus 100
+    :param log_output: if True the iterations are printed
+    :return: tuple of the solution array and the status ("optimal" or "iteration limit")
+
+    Last Updated October 18, 2026
+    """
+
+    num_assets = len(lower_bounds)
+    max_iter = 10*num_assets + 100 if max_iter is None else max_iter
+    is_factor_model = isinstance(cov_matrix, fm.factor_model)
+    cov_scale = max(np.abs(cov_matrix.diag() if is_factor_model else np.diag(cov_matrix)).max(), np.finfo(np.float64).tiny)
+    mu_tol = tol * cov_scale
+    max_step = np.max(upper_bounds - lower_bounds)
+
+    x = project_to_feasible(np.zeros(num_assets) if x0 is None else np.asarray(x0, dtype=np.float64), lower_bounds, upper_bounds)
+    at_lower = x <= lower_bounds
+    at_upper = (x >= upper_bounds) & ~at_lower
+    stalled = False # True while the last iterations released bounds or took zero length steps
+    released = np.zeros(num_assets, dtype=bool) # bounds released since x last moved
+    kept = np.zeros(num_assets, dtype=bool) # released bounds that then blocked a zero length step, not released again until x moves
+
+    for iteration in range(max_iter):
+        fixed = at_lower | at_upper
+        free = ~fixed
+        gradient = cov_matrix.matvec(x) if is_factor_model else cov_matrix @ x
+
+        # equality constrained step on the free assets: C_ff p + lambda = -g_f, sum(p) = 0
+        step = np.zeros(num_assets)
+        if free.any():
+            step[free], multiplier = _kkt_step(cov_matrix, free, gradient, max_step)
+        else:
+            # every asset is at a bound, pick the equality multiplier that best satisfies the bound multipliers
+            multiplier = 0.5*(np.max(-gradient[at_lower], initial=-np.inf) + np.min(-gradient[at_upper], initial=np.inf))
+            multiplier = 0 if not np.isfinite(multiplier) else multiplier
+
+        is_zero_step = np.abs(step).max() <= tol
+        if not is_zero_step:
+            decrease = -(2*gradient.dot(step) + portfolio_variance(cov_matrix, step))
+            round_off = 100*np.finfo(np.float64).eps*cov_scale*(np.abs(x).sum() + np.abs(step).sum())**2
+            if decrease <= round_off:
+                # no progress. the multiplier of the solve is unreliable when the free block is singular, use its least squares value
+                is_zero_step = True
+                multiplier = -gradient[free].mean()
+
+        if is_zero_step:
+            # check the multipliers of the bounds. at the lower bound g + lambda >= 0, at the upper bound g + lambda <= 0
+            bound_multiplier = gradient + multiplier
+            violation = np.where(at_lower, -bound_multiplier, np.where(at_upper, bound_multiplier, -np.inf))
+            violation[(lower_bounds == upper_bounds) | kept] = -np.inf
+            release = int(np.argmax(violation))
+            if stalled and violation[release] > mu_tol:
+                release = int(np.flatnonzero(violation > mu_tol)[0]) # Bland's rule
+            if log_output:
+                print(f"iteration {iteration}: free {int(free.sum())}, max violation {violation[release]}")
+            if violation[release] <= mu_tol:
+                prof.count("active_set_iterations", iteration + 1)
+                return x, "optimal"
+            at_lower[release] = False
+            at_upper[release] = False
+            released[release] = True
+            stalled = True
+        else:
+            # move along the step until the first free asset hits a bound
+            with np.errstate(divide="ignore", invalid="ignore"):
+                ratio = np.where(step < 0, (lower_bounds - x) / step, np.where(step > 0, (upper_bounds - x) / step, np.inf))
+            ratio[fixed] = np.inf
+            blocking = int(np.argmin(ratio))
+            alpha = min(1.0, max(ratio[blocking], 0.0))
+            x = x + alpha*step
+            if alpha > 0:
+                stalled = False
+                released[:] = False
+                kept[:] = False
+            elif released[blocking]:
+                kept[blocking] = True # releasing the bound gave no descent, its multiplier is rounding error
+            if log_output:
+                print(f"iteration {iteration}: free {int(free.sum())}, step {alpha}")
+            if alpha < 1.0:
+                if step[blocking] < 0:
+                    x[blocking] = lower_bounds[blocking]
+                    at_lower[blocking] = True
+                else:
+                    x[blocking] = upper_bounds[blocking]
+                    at_upper[blocking] = True
+    prof.count("active_set_iterations", max_iter)
+    return x, "iteration limit"
+
+
+class ActiveRiskOptimizer():
+    def __init__(self, bound:float=0.1, solver="numpy", log_output:bool=False, warm_start:bool=True):
+        """
+        Optimizer session for repeated minimize_active_risk solves. The solver backend keeps its state between solves so that later solves only
+        update what changed and start from the previous solution.
+
+        :param bound: assets cannot be over/under weight by more than this. either one value for every asset, or a dictionary of ticker to its bound
+                      or its (lower, upper) active weight bounds, where the assets that are not in the dictionary keep the 0.1 bound. see bound_arrays
+        :param solver: "numpy" (built in, no licence needed), "cplex", or a qp_backend instance
+        :param log_output: if True the solver log is printed to stdout
+        :param warm_start: if True each solve starts from the previous solution
+
+        Last Updated October 18, 2026
+        """
+
+        self.bound = bound
+        if isinstance(solver, qp_backend):
+            self.backend = solver
+        elif solver in SOLVER_BACKENDS:
+            self.backend = SOLVER_BACKENDS[solver](log_output=log_output, warm_start=warm_start)
+        else:
+            raise ValueError(f"Error: Unknown solver: {solver}. Please use one of {list(SOLVER_BACKENDS.keys())}.")
+
+        self.last_solve_time = None
+        self.last_status = None
+        self.solve_log = []
+
+    def solve(self, benchmark_portfolio:dict, cash_drag:float, tr_matrix:stat.ReturnsMatrix=None, cov_matrix=None, bound=None) -> dict:
+        """
+        Minimizes the active risk of the portfolio against the benchmark given the cash drag. See minimize_active_risk.
+
+        :param benchmark_portfolio: dictionary of the universe of assets and their benchmark weights. The last asset has to be cash.
+        :param cash_drag: cash drag constraint
+        :param tr_matrix: returns matrix of the universe of assets, as a ReturnsMatrix or a DataFrame. used to calculate the covariance matrix if cov_matrix is not provided
+        :param cov_matrix: optional, precomputed covariance matrix of the universe of assets
+        :param bound: optional, overrides the session's over/under weight bound. a single value or a dictionary of per asset bounds, where the assets that
+                      are not in the dictionary keep the session's bound
+        :return: dictionary of the optimized portfolio weights. the solve time and status are recorded in last_solve_time, last_status and solve_log
+        """
+
+        sec_list = list(benchmark_portfolio.keys())
+        cov_values = covariance_matrix(sec_list, tr_matrix, cov_matrix)
+        default_bound = 0.1 if isinstance(self.bound, dict) else self.bound
+        lower_bounds, upper_bounds = bound_arrays(sec_list, self.bound if bound is None else bound, default_bound)
+
+        _start_time = time.perf_counter()
+        with prof.timer("solve", assets=len(sec_list)):
+            active_wt, self.last_status = self.backend.solve(sec_list, cov_values, cash_drag, lower_bounds, upper_bounds)
+        self.last_solve_time = time.perf_counter() - _start_time
+        self.solve_log.append({"solve_time": self.last_solve_time, "status": self.last_status})
 
+        solution_output = {}
+        for j, col in enumerate(sec_list):
+                solution_output[col] = active_wt[j] + benchmark_portfolio.get(col)
         return solution_output
 
+
+@prof.timed("covariance")
+def covariance_matrix(sec_list:list, tr_matrix:stat.ReturnsMatrix=None, cov_matrix=None):
+        """
+        :param sec_list: list of the universe of assets
+        :param tr_matrix: returns matrix of the universe of assets, as a ReturnsMatrix or a DataFrame. used if cov_matrix is not provided
+        :param cov_matrix: optional, precomputed covariance matrix. a DataFrame indexed by ticker, a stat.covariance_estimator, a fm.factor_model, or an array
+                           in the order of sec_list
+        :return: covariance matrix array in the order of sec_list, or the fm.factor_model of sec_list which is kept in its factor form
+        """
+
+        if isinstance(cov_matrix, fm.factor_model):
+                return cov_matrix if cov_matrix.columns is None else cov_matrix.subset(sec_list)
+        if cov_matrix is None:
+                if tr_matrix is None:
+                        raise ValueError("Error: Please provide the returns matrix or a covariance matrix.")
+                cov_matrix = stat.as_returns_matrix(tr_matrix).cov()
+        elif isinstance(cov_matrix, stat.covariance_estimator):
+                cov_matrix = cov_matrix.cov()
+        if isinstance(cov_matrix, pd.DataFrame):
+                cov_matrix = cov_matrix.loc[sec_list, sec_list]
+        return np.asarray(cov_matrix, dtype=np.float64)
+
+
+def bound_arrays(sec_list:list, bound, default_bound=0.1) -> tuple:
+        """
+        :param sec_list: list of the universe of assets
+        :param bound: a single over/under weight bound for every asset, or a dictionary of ticker to either its bound or its (lower, upper) active weight
+                      bounds, ie. {"RY CN": 0.05, "cash": (0, 0.2)}
+        :param default_bound: bound of the assets that are not in the bound dictionary, a single value or (lower, upper). by default 0.1
+        :return: tuple of the lower bound and upper bound arrays of the active weights in the order of sec_list
+        """
+
+        if not isinstance(bound, dict):
+                return np.full(len(sec_list), -float(bound)), np.full(len(sec_list), float(bound))
+
+        lower_bounds = np.empty(len(sec_list))
+        upper_bounds = np.empty(len(sec_list))
+        for j, col in enumerate(sec_list):
+                asset_bound = bound.get(col, default_bound)
+                if isinstance(asset_bound, (tuple, list)):
+                        lower_bounds[j], upper_bounds[j] = asset_bound
+                else:
+                        lower_bounds[j], upper_bounds[j] = -asset_bound, asset_bound
+        if np.any(lower_bounds > upper_bounds):
+                raise ValueError("Error: The lower bound of an asset is above its upper bound.")
+        return lower_bounds, upper_bounds
+
+
+def minimize_active_risk(benchmark_portfolio:dict, cash_drag:float, tr_matrix:stat.ReturnsMatrix=None, cov_matrix=None, optimizer:ActiveRiskOptimizer=None, solver="numpy") -> dict:
+        """
+        ============================================================
+        This file gives us a sample to use Cplex Python API (or the
+        built in NumPy solver) to establish a Quadratic Programming
+        model and then solve it.
+        The Quadratic Programming problem displayed below is as:
+                         min z = xCx
+           subject to:      cash > [cash_drag]
+        ============================================================
+        :param benchmark_portfolio: dictionary of the universe of assets that we can use to optimize and their weights represented in the benchmark_portfolio. The last asset has to be cash.
+        :param cash_drag: cash drag constraint
+        :param tr_matrix: returns matrix of the universe of assets, as a ReturnsMatrix or a DataFrame. used to calculate the covariance matrix if cov_matrix is not provided
+        :param cov_matrix: optional, precomputed covariance matrix of the universe of assets, ie. from a stat.covariance_estimator. a DataFrame indexed by ticker, or an array in the order of benchmark_portfolio.
+                           a fm.factor_model keeps the problem in its factor form for large universes
+        :param optimizer: optional, ActiveRiskOptimizer session to reuse across repeated solves. by default a new session is created for this call
+        :param solver: solver backend of the new session, "numpy" or "cplex". ignored if optimizer is provided
+        :return:
+        """
+
+        if optimizer is None:
+                optimizer = ActiveRiskOptimizer(solver=solver)
+        return optimizer.solve(benchmark_portfolio=benchmark_portfolio, cash_drag=cash_drag, tr_matrix=tr_matrix, cov_matrix=cov_matrix)
+
         #
         # _solution = myProblem.solution.get_values()
         # _solution_active_wt = np.asarray(myProblem.solution.get_values(), dtype=np.float32) #assume the portfolio is in 100% cash. The index is an equal weight of the 6 bank stocks.
@@ -83,4 +586,126 @@ def minimize_active_risk(benchmark_portfolio:dict, cash_drag:float, tr_matrix:pd
         # _default_active_wt = np.asarray(_default, dtype=np.float32)
         # print(f"Default: the 1 day active risk is {10000*math.sqrt(_default_active_wt.dot(cov_matrix.values).dot(_default_active_wt))}bps")
         # print(f"Default: the active portfolio is:")
-        # print(_default_active_wt)
\ No newline at end of file
+        # print(_default_active_wt)
+
+def scenario_grid(cash_drags:list, bounds:list=None, training_windows:list=None) -> list:
+        """
+        Every combination of the cash drags, bounds and training windows.
+
+        :param cash_drags: list of cash drag constraints
+        :param bounds: list of bounds, each a single value or a dictionary of per asset bounds where the other assets keep the 0.1 bound
+                       (see bound_arrays). by default [0.1]
+        :param training_windows: list of (start_date, end_date) of the returns used for the covariance matrix. None means the start/end of the returns matrix.
+                                 by default the whole returns matrix
+        :return: list of scenario dictionaries with keys cash_drag, bound, start_date, end_date
+        """
+
+        bounds = [0.1] if bounds is None else bounds
+        training_windows = [(None, None)] if training_windows is None else training_windows
+        return [{"cash_drag": cash_drag, "bound": bound, "start_date": start_date, "end_date": end_date}
+                for (start_date, end_date) in training_windows for bound in bounds for cash_drag in cash_drags]
+
+
+_scenario_covariances = [] # covariance of each training window, sent once to each worker process of optimize_scenarios
+
+def _init_scenario_worker(covariances:list) -> None:
+        global _scenario_covariances
+        _scenario_covariances = covariances
+
+
+def _solve_window_scenarios(benchmark_portfolio:dict, window:int, scenarios:list, solver) -> list:
+        """
+        Solves scenarios in a worker process of optimize_scenarios with the covariance of their training window
+        """
+
+        return _solve_scenarios(benchmark_portfolio, _scenario_covariances[window], scenarios, solver)
+
+
+def _solve_scenarios(benchmark_portfolio:dict, cov_values, scenarios:list, solver) -> list:
+        """
+        Solves scenarios that share one covariance matrix in one optimizer session, so that each solve starts from the previous one.
+        A scenario whose bounds and cash drag leave no feasible portfolio is not solved, its weights and active risk are NaN and its status is "infeasible".
+
+        :return: list of (weights dictionary, active risk, status, solve time) in the order of scenarios
+        """
+
+        optimizer = ActiveRiskOptimizer(solver=solver)
+        sec_list = list(benchmark_portfolio.keys())
+        bench_wt = np.asarray(list(benchmark_portfolio.values()), dtype=np.float64)
+        results = []
+        for scenario in scenarios:
+                if not is_feasible(*bound_arrays(sec_list, scenario["bound"]), scenario["cash_drag"]):
+                        results.append((dict.fromkeys(sec_list, np.nan), np.nan, "infeasible", 0.0))
+                        continue
+                solution = optimizer.solve(benchmark_portfolio, scenario["cash_drag"], cov_matrix=cov_values, bound=scenario["bound"])
+                active_wt = np.asarray(list(solution.values())) - bench_wt
+                active_risk = math.sqrt(max(portfolio_variance(cov_values, active_wt), 0))
+                results.append((solution, active_risk, optimizer.last_status, optimizer.last_solve_time))
+        return results
+
+
+def optimize_scenarios(benchmark_portfolio:dict, tr_matrix:stat.ReturnsMatrix, scenarios:list, solver="numpy", max_workers:int=None, chunks_per_worker:int=4, num_factors:int=None) -> pd.DataFrame:
+        """
+        Minimizes the active risk for a batch of scenarios over one returns matrix. The covariance matrix is calculated once per training window and
+        the solves are split into chunks that run on a process pool. Each worker process receives the covariance matrices once, not with every chunk.
+        Scenarios that leave no feasible portfolio are reported with the status "infeasible" and NaN weights.
+
+        :param benchmark_portfolio: dictionary of the universe of assets and their benchmark weights. The last asset has to be cash.
+        :param tr_matrix: returns matrix of the universe of assets, as a ReturnsMatrix or a DataFrame
+        :param scenarios: list of scenario dictionaries with the key cash_drag and optionally bound (default 0.1), start_date and end_date (default the
+                          whole returns matrix). see scenario_grid
+        :param solver: solver backend, "numpy" or "cplex"
+        :param max_workers: number of worker processes. by default the number of cores. 1 solves everything in this process
+        :param chunks_per_worker: the scenarios of each training window are split into about this many chunks per worker
+        :param num_factors: optional, if provided each training window uses a fm.pca_factor_model with this many factors instead of the sample covariance matrix
+        :return: DataFrame with one row per scenario and asset: scenario, cash_drag, start_date, end_date, ticker, lower_bound, upper_bound, bench_weight,
+                 weight, active_weight, active_risk (ex-ante daily std dev of the active returns), status, solve_time
+
+        Last Updated October 18, 2026
+        """
+
+        sec_list = list(benchmark_portfolio.keys())
+        tr_matrix = stat.as_returns_matrix(tr_matrix)
+        max_workers = os.cpu_count() if max_workers is None else max_workers
+
+        # group the scenarios by training window so that each covariance matrix is calculated once
+        windows = {}
+        for i, scenario in enumerate(scenarios):
+                windows.setdefault((scenario.get("start_date"), scenario.get("end_date")), []).append(i)
+
+        tasks = []
+        covariances = []
+        for (start_date, end_date), scenario_ids in windows.items():
+                training_returns = tr_matrix.window(start_date=start_date, end_date=end_date)
+                if num_factors is None:
+                        cov_values = covariance_matrix(sec_list, cov_matrix=training_returns.cov())
+                else:
+                        cov_values = covariance_matrix(sec_list, cov_matrix=fm.pca_factor_model(training_returns, num_factors=num_factors))
+                covariances.append(cov_values)
+                chunk_size = max(1, math.ceil(len(scenarios) / (max_workers*chunks_per_worker)))
+                for k in range(0, len(scenario_ids), chunk_size):
+                        chunk_ids = scenario_ids[k:k+chunk_size]
+                        chunk = [{"cash_drag": scenarios[i]["cash_drag"], "bound": scenarios[i].get("bound", 0.1)} for i in chunk_ids]
+                        tasks.append((chunk_ids, len(covariances) - 1, chunk))
+
+        results = [None]*len(scenarios)
+        if max_workers <= 1 or len(tasks) <= 1:
+                for chunk_ids, window, chunk in tasks:
+                        for i, result in zip(chunk_ids, _solve_scenarios(benchmark_portfolio, covariances[window], chunk, solver)):
+                                results[i] = result
+        else:
+                with concurrent.futures.ProcessPoolExecutor(max_workers=min(max_workers, len(tasks)), initializer=_init_scenario_worker, initargs=(covariances,)) as executor:
+                        futures = {executor.submit(prof.profiled_call, _solve_window_scenarios, benchmark_portfolio, window, chunk, solver): chunk_ids for chunk_ids, window, chunk in tasks}
+                        for future in concurrent.futures.as_completed(futures):
+                                for i, result in zip(futures[future], prof.merge(*future.result())):
+                                        results[i] = result
+
+        rows = []
+        for i, (scenario, (solution, active_risk, status, solve_time)) in enumerate(zip(scenarios, results)):
+                lower_bounds, upper_bounds = bound_arrays(sec_list, scenario.get("bound", 0.1))
+                for j, col in enumerate(sec_list):
+                        rows.append({"scenario": i, "cash_drag": scenario["cash_drag"], "start_date": scenario.get("start_date"), "end_date": scenario.get("end_date"),
+                                     "ticker": col, "lower_bound": lower_bounds[j], "upper_bound": upper_bounds[j], "bench_weight": benchmark_portfolio[col],
+                                     "weight": solution[col], "active_weight": solution[col] - benchmark_portfolio[col],
+                                     "active_risk": active_risk, "status": status, "solve_time": solve_time})
+        return pd.DataFrame(rows)
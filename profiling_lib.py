@@ -0,0 +1,314 @@
+import os
+import sys
+import time
+import json
+import atexit
+import functools
+import threading
+import tracemalloc
+import multiprocessing
+
+try:
+    import resource
+except ImportError:
+    resource = None # not available on Windows
+
+PROFILE_ENV_VAR = "OPTIMIZATION_PROFILE" # output file, profiling is enabled for the whole run when set
+PROFILE_FORMAT_ENV_VAR = "OPTIMIZATION_PROFILE_FORMAT" # "json" (default) or "chrome"
+PROFILE_MEMORY_ENV_VAR = "OPTIMIZATION_PROFILE_MEMORY" # "1" traces the python allocations with tracemalloc
+
+_enabled = False
+_output_fname = None
+_output_format = "json"
+_trace_memory = False
+_start_time = 0.0
+_events = []
+_timers = {}
+_counters = {}
+_memory = {}
+_stage_stack = [] # stages that are running, so a nested stage can pass its memory peak on to the stage it runs in
+_stage_depth = {} # number of running stages of each name, only the outermost of nested stages with the same name is recorded
+_owner_pid = None # process that called enable(), the only one that writes the profile at exit
+
+class _null_timer():
+    """
+    Timer that does nothing, returned while profiling is disabled so an instrumented stage costs one function call
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+_NULL_TIMER = _null_timer()
+
+class _stage_timer():
+    __slots__ = ("name", "args", "start", "start_memory", "peak_memory", "outermost")
+
+    def __init__(self, name:str, args:dict):
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.outermost = _stage_depth.get(self.name, 0) == 0
+        _stage_depth[self.name] = _stage_depth.get(self.name, 0) + 1
+        if _trace_memory and tracemalloc.is_tracing():
+            # the peak is reset so it only covers this stage. the peak so far is passed on to the stage this one runs in
+            self.start_memory, outer_peak = tracemalloc.get_traced_memory()
+            if _stage_stack:
+                _stage_stack[-1].peak_memory = max(_stage_stack[-1].peak_memory, outer_peak)
+            tracemalloc.reset_peak()
+            self.peak_memory = self.start_memory
+            _stage_stack.append(self)
+        else:
+            self.start_memory = None
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        end = time.perf_counter()
+        stage_memory = None
+        if self.start_memory is not None and tracemalloc.is_tracing():
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+            stage_memory = self.peak_memory - self.start_memory
+            if _stage_stack and _stage_stack[-1] is self:
+                _stage_stack.pop()
+            if _stage_stack:
+                _stage_stack[-1].peak_memory = max(_stage_stack[-1].peak_memory, self.peak_memory)
+        _stage_depth[self.name] -= 1
+        if self.outermost:
+            _record(self.name, self.start, end, self.args, stage_memory)
+        return False
+
+
+def enable(output_fname:str=None, output_format:str="json", trace_memory:bool=False) -> None:
+    """
+    Starts recording the instrumented stages. Any previous recording is cleared.
+
+    :param output_fname: optional, file that write() saves to by default
+    :param output_format: "json" for a summary of the timers, counters and memory high-water marks, or "chrome" for a trace that can be opened in
+                          chrome://tracing or Perfetto
+    :param trace_memory: if True the python allocations are traced with tracemalloc, which gives the memory high-water mark of each stage but slows the run down.
+                         otherwise only the peak resident size of the whole process is reported, where available
+
+    Last Updated October 18, 2026
+    """
+
+    global _enabled, _output_fname, _output_format, _trace_memory, _owner_pid
+    if output_format not in ("json", "chrome"):
+        raise ValueError(f"Error: Unknown profile format: {output_format}. Please use json or chrome.")
+
+    _output_fname = output_fname
+    _output_format = output_format
+    _trace_memory = trace_memory
+    _owner_pid = os.getpid()
+    reset()
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    _enabled = True
+
+
+def reset() -> None:
+    """
+    Clears what was recorded and keeps the settings of enable()
+    """
+
+    global _start_time, _events, _timers, _counters, _memory
+    _start_time = time.perf_counter()
+    _events = []
+    _timers = {}
+    _counters = {}
+    _memory = {}
+    _stage_stack.clear()
+    _stage_depth.clear()
+
+
+def disable() -> None:
+    """
+    Stops recording. What was recorded is kept until the next enable()
+    """
+
+    global _enabled
+    _enabled = False
+    if _trace_memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def timer(name:str, **args):
+    """
+    Times a stage of the pipeline:
+        with prof.timer("solve", assets=len(sec_list)):
+            ...
+
+    :param name: name of the stage. stages with the same name are aggregated, and a stage that runs inside a stage of the same name is part of it
+    :param args: optional, details of this call that are shown in the chrome trace
+    :return: context manager
+    """
+
+    if not _enabled:
+        return _NULL_TIMER
+    return _stage_timer(name, args)
+
+
+def timed(name:str):
+    """
+    Decorator that times every call of a function as the stage name
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _stage_timer(name, None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def count(name:str, value:float=1) -> None:
+    """
+    Adds to a counter, ie. the number of securities loaded or active-set iterations
+    """
+
+    if not _enabled:
+        return
+    _counters[name] = _counters.get(name, 0) + value
+    if _output_format == "chrome":
+        _events.append({"name": name, "ph": "C", "ts": 1e6*(time.perf_counter() - _start_time), "pid": os.getpid(), "args": {name: _counters[name]}})
+
+
+def process_max_rss():
+    """
+    :return: the peak resident size of the process in bytes since it started. None where it is not available
+    """
+
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else 1024*max_rss # kilobytes on linux
+
+
+def _record(name:str, start:float, end:float, args:dict, stage_memory:int=None) -> None:
+    duration = end - start
+    stage = _timers.get(name)
+    if stage is None:
+        _timers[name] = {"count": 1, "total": duration, "max": duration}
+    else:
+        stage["count"] += 1
+        stage["total"] += duration
+        stage["max"] = max(stage["max"], duration)
+
+    if stage_memory is not None:
+        _memory[name] = max(_memory.get(name, 0), stage_memory)
+
+    if _output_format == "chrome":
+        event = {"name": name, "ph": "X", "ts": 1e6*(start - _start_time), "dur": 1e6*duration, "pid": os.getpid(), "tid": threading.get_ident()}
+        if args:
+            event["args"] = args
+        _events.append(event)
+
+
+def report() -> dict:
+    """
+    :return: dictionary of the timers (count, total and max seconds of each stage), the counters, the memory high-water mark of each stage in bytes
+             and the peak resident size of the process in bytes. The memory of a stage is the peak traced python memory during the stage above the memory
+             in use when it started, including its nested stages, and is only recorded when tracing the memory
+    """
+
+    return {"timers": {name: dict(stage) for name, stage in _timers.items()}, "counters": dict(_counters), "memory_high_water": dict(_memory),
+            "process_max_rss": process_max_rss()}
+
+
+def profiled_call(func, *args, **kwargs) -> tuple:
+    """
+    Runs a task in a worker process of a process pool and records its stages separately, since the worker's stages are lost when it exits.
+    The parent process adds them to its own recording with merge():
+        future = executor.submit(prof.profiled_call, func, *args)
+        result = prof.merge(*future.result())
+
+    :return: tuple of the result of func(*args, **kwargs) and the profile of the call, which is None while profiling is disabled
+    """
+
+    if not _enabled:
+        return func(*args, **kwargs), None
+
+    # a forked worker starts with a copy of the parent's recording, and a worker runs several tasks
+    reset()
+    result = func(*args, **kwargs)
+    profile = report()
+    profile["start_time"] = time.time() - (time.perf_counter() - _start_time)
+    profile["events"] = _events
+    return result, profile
+
+
+def merge(result, profile:dict=None):
+    """
+    Adds the stages recorded by profiled_call in a worker process to this recording. The times of the stages in the workers are added up, so the total of
+    a stage can be longer than the run.
+
+    :param result: result of the task, returned as is
+    :param profile: profile of the task from profiled_call
+    :return: result
+    """
+
+    if profile is None or not _enabled:
+        return result
+
+    for name, worker_stage in profile["timers"].items():
+        stage = _timers.get(name)
+        if stage is None:
+            _timers[name] = dict(worker_stage)
+        else:
+            stage["count"] += worker_stage["count"]
+            stage["total"] += worker_stage["total"]
+            stage["max"] = max(stage["max"], worker_stage["max"])
+    for name, value in profile["counters"].items():
+        _counters[name] = _counters.get(name, 0) + value
+    for name, stage_memory in profile["memory_high_water"].items():
+        _memory[name] = max(_memory.get(name, 0), stage_memory)
+
+    if _output_format == "chrome":
+        # the events of the worker are relative to the start of its recording
+        offset = 1e6*(profile["start_time"] - (time.time() - (time.perf_counter() - _start_time)))
+        for event in profile["events"]:
+            _events.append({**event, "ts": event["ts"] + offset})
+    return result
+
+
+def write(output_fname:str=None, output_format:str=None) -> None:
+    """
+    Writes what was recorded to a file
+    :param output_fname: by default the output file given to enable()
+    :param output_format: "json" or "chrome". by default the format given to enable(). the chrome trace also has the json summary under "otherData"
+    """
+
+    output_fname = _output_fname if output_fname is None else output_fname
+    output_format = _output_format if output_format is None else output_format
+    if output_fname is None:
+        raise ValueError("Error: Please provide the profile output file.")
+
+    if output_format == "chrome":
+        output = {"traceEvents": _events, "displayTimeUnit": "ms", "otherData": report()}
+    else:
+        output = report()
+    with open(output_fname, "w") as f:
+        json.dump(output, f, indent=1)
+    print(f"Profile written to {output_fname}")
+
+
+def _write_at_exit() -> None:
+    if (_enabled or _timers) and os.getpid() == _owner_pid:
+        write()
+
+
+if os.environ.get(PROFILE_ENV_VAR):
+    enable(os.environ[PROFILE_ENV_VAR], os.environ.get(PROFILE_FORMAT_ENV_VAR, "json"), os.environ.get(PROFILE_MEMORY_ENV_VAR) == "1")
+    # the worker processes of a process pool import this module too. they record their stages for profiled_call but only the main process writes the profile
+    if multiprocessing.parent_process() is None:
+        atexit.register(_write_at_exit)
@@ -2,30 +2,35 @@ import datetime as dt
 import pandas as pd
 import numpy as np
 import os.path
+import io
+import cache_lib
+import market_data_lib as mkt
+import profiling_lib as prof
+
+MARKET_DATA_DIR = mkt.MARKET_DATA_DIR
+RETURNS_CACHE_SUBDIR = "cache" # the returns matrix cache is stored in this folder within the data folder
 
 class equity_returns():
-    def __init__(self, stock_ticker:str, start_date:dt.datetime=None, end_date:dt.datetime=dt.datetime.now()):
+    def __init__(self, stock_ticker:str, start_date:dt.datetime=None, end_date:dt.datetime=dt.datetime.now(), dvd_store=None, data_dir:str=MARKET_DATA_DIR):
         """
         This class calculates the equity returns using the securities pricing and dvd
 
         :param stock_ticker: Bloomberg ticker of the security: ie. AAPL US
         :param start_date: the date where we want to begin looking at the training data. by default we go as far back as possible
         :param end_date: the date where we want to end looking at the training data. by default we look at data until today
+        :param dvd_store: optional, dividend_store shared across securities so the dividend file is only loaded once
+        :param data_dir: folder with the market data files
 
-        Last Updated June 03, 2024
+        Last Updated October 18, 2026
         """
 
         self.ticker_exch = stock_ticker
         self.ticker = stock_ticker.split(" ")[0]
+        self.dvd_store = dvd_store
+        self.data_dir = data_dir
 
-        # Retrieve dividends data
-        dvd_file = self.retrieve_dvd_data(start_date, end_date)
-
-        # Retrieve market data
-        df_stock_returns = self.retrieve_market_data(start_date, end_date)
-
-        # merge dividend rate with stock returns dataset
-        df_stock_returns["dvd_amount"] = df_stock_returns["Dates"].map(dict(zip(dvd_file["ex_date"], dvd_file["dvd_amount"])))
+        # retrieve the market data merged with the dividend rates
+        df_stock_returns = load_security_data(stock_ticker, start_date, end_date, data_dir=data_dir, dvd_store=dvd_store)
 
         # calculate the total return
         self.total_return = self.total_return_calc(df_stock_returns, "PX_LAST", "dvd_amount")
@@ -39,16 +44,7 @@ class equity_returns():
         :return: market data for the security with the relevant timeframe
         """
 
-        mkt_data_fname = f"market_data\\{self.ticker}.csv"
-        if not os.path.isfile(mkt_data_fname):
-            raise ValueError(f"Erorr: No Market Data available for: {self.ticker}")
-        else:
-            market_data = pd.read_csv(f"market_data\\{self.ticker}.csv")
-            # filter data so that it is within the specified range start_date/end_date
-            market_data = market_data[pd.to_datetime(market_data["Dates"]) <= _end_date]
-            if not _start_date is None:
-                market_data = market_data[pd.to_datetime(market_data["Dates"]) >= _start_date]
-        return market_data
+        return retrieve_market_data(self.ticker_exch, _start_date, _end_date, data_dir=self.data_dir)
 
 
     def retrieve_dvd_data(self, _start_date:dt.datetime, _end_date:dt.datetime) -> pd.DataFrame:
@@ -59,22 +55,7 @@ class equity_returns():
         :return: dividend rates for the security with the relevant timeframe
         """
 
-        dvd_data_fname = f"market_data\\dividends.csv"
-        if not os.path.isfile(dvd_data_fname):
-            raise ValueError(f"Error: Dividend File does not exist.")
-        else:
-            dvd_data = pd.read_csv(dvd_data_fname)
-            # filter by ticker
-            dvd_data = dvd_data[dvd_data["ticker"] == self.ticker_exch]
-            if dvd_data.empty:
-                print(f"No Dividend Data for: {self.ticker_exch}")
-            else:
-                # filter data so that it is within the specified range start_date/end_date
-                dvd_data["ex_date"] = pd.to_datetime(dvd_data["ex_date"]).dt.strftime("%Y-%m-%d")
-                dvd_data = dvd_data[pd.to_datetime(dvd_data["ex_date"]) <= _end_date]
-                if not _start_date is None:
-                    dvd_data = dvd_data[pd.to_datetime(dvd_data["ex_date"]) >= _start_date]
-        return dvd_data
+        return retrieve_dvd_data(self.ticker_exch, _start_date, _end_date, data_dir=self.data_dir, dvd_store=self.dvd_store)
 
 
     def total_return_calc(self, data: pd.DataFrame, price_col: str, dvd_col: str):
@@ -86,145 +67,881 @@ class equity_returns():
         :param dvd_col: name of the dividend column
         :return: adds a column called total_return_price which is the price of the security with reinvestment
 
-        Last Updated June 03, 2024
+        Last Updated October 18, 2026
         """
 
         data = data.reset_index(drop=True)
 
         # format the dvd col
         data[dvd_col] = data[dvd_col].fillna(0)
-        data[dvd_col] = np.where(data[dvd_col] == str(""), 0, data[dvd_col])
-
-        # add placeholder column for dvd reinvestments
-        data["dvd_reinvestment"] = None
+        data[dvd_col] = np.where(data[dvd_col] == str(""), 0, data[dvd_col]).astype(np.float64)
 
         # calculate the dividend reinvestment returns
-        for row in data.itertuples():
-            if row.Index == 0:
-                if (data.loc[row.Index, dvd_col] > 0):
-                    raise Exception("There cannot be a dividend on the first day otherwise we cannot properly calculate the reinvestment.")
-                else:
-                    data.loc[row.Index, "dvd_reinvestment"] = 0
-            else:
-                if (data.loc[row.Index, dvd_col] > 0):
-                    daily_return = data.loc[row.Index, price_col] / (data.loc[row.Index - 1, price_col] - data.loc[row.Index, dvd_col])
-                    data.loc[row.Index, "dvd_reinvestment"] = (data.loc[row.Index - 1, "dvd_reinvestment"] + data.loc[row.Index, dvd_col]) * daily_return
-                else:
-                    daily_return = data.loc[row.Index, price_col] / data.loc[row.Index - 1, price_col]
-                    data.loc[row.Index, "dvd_reinvestment"] = data.loc[row.Index - 1, "dvd_reinvestment"] * daily_return
-
-        data['total_return_price'] = data['dvd_reinvestment'] + data[price_col]
+        dvd_reinvestment, total_return_price = total_return_engine(data[price_col].to_numpy(dtype=np.float64), data[dvd_col].to_numpy())
+        data["dvd_reinvestment"] = dvd_reinvestment
+        data['total_return_price'] = total_return_price
         return data
 
 
-def calc_returns_matrix(sec_list:list):
-    # May need to add a parameter to indicate the relevant timeframe
+class dividend_store():
+    @prof.timed("load_data")
+    def __init__(self, data_dir:str=MARKET_DATA_DIR, dvd_data:pd.DataFrame=None):
+        """
+        Loads the dividend file once and groups the rows by ticker into arrays sorted by ex-date, so that the whole universe can share one copy
+        and each ticker's date range lookup is a binary search.
+
+        :param data_dir: folder with the market data files
+        :param dvd_data: optional, dividend data already loaded, ie. from a market data source. by default the dividends.csv file in data_dir is read
+
+        Last Updated October 18, 2026
+        """
 
+        if dvd_data is None:
+            dvd_data = mkt.csv_source(data_dir).load_dividends()
+
+        # parse the ex-dates once and sort by ticker then ex-date. the stable sort keeps the file order of duplicated ex-dates
+        ex_dates = pd.to_datetime(dvd_data["ex_date"]).dt.normalize()
+        dvd_data = dvd_data.assign(ex_date=ex_dates.dt.strftime("%Y-%m-%d"))
+        sort_order = np.lexsort((ex_dates.to_numpy(), dvd_data["ticker"].to_numpy().astype(str)))
+        self.data = dvd_data.iloc[sort_order].reset_index(drop=True)
+        self.ex_dates = ex_dates.to_numpy()[sort_order]
+
+        tickers, first_rows = np.unique(self.data["ticker"].to_numpy().astype(str), return_index=True)
+        last_rows = np.append(first_rows[1:], len(self.data))
+        self.ticker_rows = dict(zip(tickers.tolist(), zip(first_rows.tolist(), last_rows.tolist())))
+
+    def lookup(self, stock_ticker:str, start_date:dt.datetime=None, end_date:dt.datetime=None) -> pd.DataFrame:
+        """
+        Retrieve the dividends of a security within a date range
+        :param stock_ticker: Bloomberg ticker of the security: ie. AAPL US
+        :param start_date: the first ex-date to include. by default we go as far back as possible
+        :param end_date: the last ex-date to include. by default we look at data until today
+        :return: dividend rates for the security with the relevant timeframe, sorted by ex-date
+        """
+
+        first_row, last_row = self.ticker_rows.get(stock_ticker, (0, 0))
+        if first_row == last_row:
+            return self.data.iloc[0:0]
+
+        ex_dates = self.ex_dates[first_row:last_row]
+        _end_date = dt.datetime.now() if end_date is None else end_date
+        last_row = first_row + ex_dates.searchsorted(np.datetime64(pd.Timestamp(_end_date)), side="right")
+        if not start_date is None:
+            first_row += ex_dates.searchsorted(np.datetime64(pd.Timestamp(start_date)), side="left")
+        return self.data.iloc[first_row:max(first_row, last_row)]
+
+
+def retrieve_market_data(stock_ticker:str, start_date:dt.datetime=None, end_date:dt.datetime=dt.datetime.now(), data_dir:str=MARKET_DATA_DIR) -> pd.DataFrame:
     """
-    This function calculates a return matrix for a list of securities
-    :param sec_list: provide a list of securities
-    :return: function returns that list of securities total returns matrix
+    Retrieve market data
+    :param stock_ticker: Bloomberg ticker of the security: ie. AAPL US
+    :param start_date: the date where we want to begin looking at the training data. by default we go as far back as possible
+    :param end_date: the date where we want to end looking at the training data. by default we look at data until today
+    :param data_dir: folder with the market data files
+    :return: market data for the security with the relevant timeframe
+    """
+
+    return mkt.csv_source(data_dir).load_security_prices(stock_ticker, start_date, end_date)
+
+
+def retrieve_dvd_data(stock_ticker:str, start_date:dt.datetime=None, end_date:dt.datetime=dt.datetime.now(), data_dir:str=MARKET_DATA_DIR, dvd_store:dividend_store=None) -> pd.DataFrame:
+    """
+    Retrieve dividends data
+    :param stock_ticker: Bloomberg ticker of the security: ie. AAPL US
+    :param start_date: the date where we want to begin looking at the training data. by default we go as far back as possible
+    :param end_date: the date where we want to end looking at the training data. by default we look at data until today
+    :param data_dir: folder with the market data files
+    :param dvd_store: optional, dividend store shared across securities. by default the dividend file is loaded for this call
+    :return: dividend rates for the security with the relevant timeframe
+    """
+
+    if dvd_store is None:
+        dvd_store = dividend_store(data_dir)
+
+    dvd_data = dvd_store.lookup(stock_ticker, start_date, end_date)
+    if dvd_data.empty:
+        print(f"No Dividend Data for: {stock_ticker}")
+    return dvd_data
+
+
+@prof.timed("load_data")
+def load_security_data(stock_ticker:str, start_date:dt.datetime=None, end_date:dt.datetime=dt.datetime.now(), data_dir:str=MARKET_DATA_DIR, dvd_store:dividend_store=None) -> pd.DataFrame:
+    """
+    Retrieves the market data of a security and merges in the dividend rates on the ex-dates
+    :param stock_ticker: Bloomberg ticker of the security: ie. AAPL US
+    :param start_date: the date where we want to begin looking at the training data. by default we go as far back as possible
+    :param end_date: the date where we want to end looking at the training data. by default we look at data until today
+    :param data_dir: folder with the market data files
+    :param dvd_store: optional, dividend store shared across securities
+    :return: market data with a dvd_amount column
+    """
+
+    # Retrieve dividends data
+    dvd_file = retrieve_dvd_data(stock_ticker, start_date, end_date, data_dir, dvd_store)
+
+    # Retrieve market data
+    df_stock_returns = retrieve_market_data(stock_ticker, start_date, end_date, data_dir)
+
+    # merge dividend rate with stock returns dataset
+    return merge_dividends(df_stock_returns, dvd_file)
+
+
+def merge_dividends(market_data:pd.DataFrame, dvd_file:pd.DataFrame) -> pd.DataFrame:
+    """
+    :param market_data: market data of a security with a Dates column
+    :param dvd_file: dividend rates of the security, see dividend_store.lookup
+    :return: market data with a dvd_amount column of the dividend that goes ex on each date
+    """
+
+    if dvd_file.empty:
+        market_data["dvd_amount"] = np.nan
+    else:
+        market_data["dvd_amount"] = market_data["Dates"].map(dict(zip(dvd_file["ex_date"], dvd_file["dvd_amount"])))
+    return market_data
+
+
+@prof.timed("total_return")
+def total_return_engine(prices:np.ndarray, dividends:np.ndarray, prior_prices:np.ndarray=None, prior_reinvestment:np.ndarray=None) -> tuple:
     """
+    Vectorized total return calculation with dividend reinvestment. Accepts a single price series or a 2-D panel (dates x securities) so that a whole universe is computed in one call.
 
-    #initiate the total returns matrix
-    total_returns_matrix = pd.DataFrame()
-    count = 0
+    The reinvestment follows the recurrence r[t] = (r[t-1] + dvd[t]) * px[t] / (px[t-1] - dvd[t]) with r[0] = 0, which is solved in closed form
+    with the cumulative growth factor G[t]: r[t] = G[t] * sum(dvd[s] / G[s-1] for s <= t).
+    Leading NaN prices are treated as the security not being listed yet, its first priced row is its first day. Gaps after the first priced row are carried forward.
+
+    :param prices: array of prices, 1-D (dates) or 2-D (dates x securities)
+    :param dividends: array of dividends of the same shape as prices. NaN is treated as no dividend
+    :param prior_prices: optional, last price of each security before the first row. used to continue the calculation from a previous run
+    :param prior_reinvestment: optional, dvd_reinvestment of each security on the prior price date
+    :return: tuple of (dvd_reinvestment, total_return_price) arrays of the same shape as prices
+
+    Last Updated October 18, 2026
+    """
+
+    prices = np.asarray(prices, dtype=np.float64)
+    dividends = np.nan_to_num(np.asarray(dividends, dtype=np.float64))
+    is_series = prices.ndim == 1
+    if is_series:
+        prices = prices[:, None]
+        dividends = dividends[:, None]
+
+    # continue from a previous run by treating the prior price as the first day
+    is_continued = prior_prices is not None
+    if is_continued:
+        prices = np.vstack([np.asarray(prior_prices, dtype=np.float64).reshape(1, -1), prices])
+        dividends = np.vstack([np.zeros((1, prices.shape[1])), dividends])
+
+    num_dates, num_sec = prices.shape
+    if num_dates == 0:
+        return (np.empty(0), np.empty(0)) if is_series else (np.empty((0, num_sec)), np.empty((0, num_sec)))
+
+    # the first priced row of each security is its first day
+    priced = ~np.isnan(prices)
+    first_row = priced.argmax(axis=0)
+    if np.any(dividends[first_row, np.arange(num_sec)][priced.any(axis=0)] > 0):
+        raise Exception("There cannot be a dividend on the first day otherwise we cannot properly calculate the reinvestment.")
+
+    # carry prices forward over gaps so a gap day has no growth
+    row_idx = np.where(priced, np.arange(num_dates)[:, None], 0)
+    np.maximum.accumulate(row_idx, axis=0, out=row_idx)
+    filled_prices = prices[row_idx, np.arange(num_sec)]
+    lagged_prices = np.vstack([filled_prices[:1], filled_prices[:-1]])
+
+    started = (np.arange(num_dates)[:, None] > first_row) & priced
+    dvd = np.where(started, dividends, 0.0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(started, filled_prices / (lagged_prices - dvd), 1.0)
+        cum_growth = np.cumprod(growth, axis=0)
+        prior_cum_growth = np.vstack([np.ones((1, num_sec)), cum_growth[:-1]])
+        dvd_reinvestment = cum_growth * np.cumsum(dvd / prior_cum_growth, axis=0)
+
+    if is_continued:
+        prices = prices[1:]
+        dvd_reinvestment = dvd_reinvestment[1:]
+        if prior_reinvestment is not None:
+            dvd_reinvestment += np.nan_to_num(np.asarray(prior_reinvestment, dtype=np.float64)).reshape(1, -1) * cum_growth[1:]
+    total_return_price = dvd_reinvestment + prices
+
+    if is_series:
+        return dvd_reinvestment[:, 0], total_return_price[:, 0]
+    return dvd_reinvestment, total_return_price
+
+
+@prof.timed("returns_matrix")
+def calc_returns_matrix(sec_list:list, start_date:dt.datetime=None, end_date:dt.datetime=None, data_dir:str=MARKET_DATA_DIR, cache_dir:str=None, return_state:bool=False,
+                        source=None, use_cache:bool=True):
+    """
+    This function calculates a return matrix for a list of securities. The total returns of every security are calculated in one batched call.
+    The finished matrix is cached on disk. A warm run with unchanged market data files loads the cache, and when the files only had rows appended, only the new dates are calculated.
+    The cache only applies to the csv files, a database source is read in bulk on every call.
+    :param sec_list: provide a list of securities
+    :param start_date: the date where we want to begin looking at the data. by default we go as far back as possible
+    :param end_date: the date where we want to end looking at the data. by default we look at data until today
+    :param data_dir: folder with the market data files
+    :param cache_dir: folder where the returns matrix cache is stored. by default the cache folder within data_dir
+    :param return_state: if True the state needed to extend the returns (last date, last row and each security's last price and dividend reinvestment) is also returned
+    :param source: optional, market data source, ie. market_data_lib.sql_source. by default the csv files in data_dir
+    :param use_cache: if False the returns matrix is always calculated from the market data and the cache is not read or written
+    :return: function returns that list of securities total returns matrix, or a tuple of the matrix and its state if return_state is True
+
+    Last Updated October 18, 2026
+    """
 
     #ensure that cash is not the first asset. otherwise there will be an error since cash defaults every day to 0, there is no date range.
     if "cash" in sec_list:
         sec_list.remove("cash")
         sec_list += ["cash"]
 
-    for sec in sec_list:
-        count += 1
-        print(f"Calculating data for {sec}: {count}/{len(sec_list)}")
-        if sec == "cash":
-            total_returns_matrix['cash'] = 0
-        else:
-            # calculate the total return of the security
-            sec_data = equity_returns(sec)
-            security_tr = sec_data.total_return
+    if source is None:
+        source = mkt.csv_source(data_dir)
+    is_csv = isinstance(source, mkt.csv_source)
+    source_files = source.source_files(sec_list) if is_csv else []
+    if not is_csv or not use_cache or not all(os.path.isfile(f) for f in source_files):
+        total_returns_matrix, state = _build_returns_matrix(sec_list, start_date, end_date, source)
+        return (total_returns_matrix, state) if return_state else total_returns_matrix
+    data_dir = source.data_dir
+    if cache_dir is None:
+        cache_dir = os.path.join(data_dir, RETURNS_CACHE_SUBDIR)
+
+    cache = cache_lib.returns_matrix_cache(cache_dir, sec_list, source_files, start_date, end_date)
+    if cache.is_current():
+        return (cache.load(), cache.state) if return_state else cache.load()
+
+    # capture the file states before reading so that rows appended while we calculate are picked up next run
+    file_states = cache.file_states()
+    appended = cache.appended_files()
+    if appended is not None:
+        new_rows, state = _extend_returns_matrix(sec_list, cache.state, appended, file_states, start_date, end_date, data_dir)
+        if new_rows is not None:
+            print(f"Appending {new_rows.shape[0]} new dates to the returns matrix cache")
+            cache.append(new_rows, state, file_states)
+            return (cache.load(), state) if return_state else cache.load()
+
+    total_returns_matrix, state = _build_returns_matrix(sec_list, start_date, end_date, source)
+    cache.save(total_returns_matrix, state, file_states)
+    return (total_returns_matrix, state) if return_state else total_returns_matrix
+
+
+def _panel_returns(price_panel:pd.DataFrame, dvd_panel:pd.DataFrame, prior_state:dict=None) -> tuple:
+    """
+    Calculates the daily total returns of a price panel (dates x securities) against each security's own prior trading day
+    :param price_panel: prices aligned on the union of dates
+    :param dvd_panel: dividends aligned on the same dates
+    :param prior_state: optional, per security state of a previous run to continue from
+    :return: tuple of the daily returns panel and the per security state as of each security's last price
+    """
 
-            # calculate the daily returns
-            security_tr[sec] = security_tr['total_return_price'].diff(1)/security_tr['total_return_price']
+    securities = price_panel.columns.tolist()
+    prior_prices = None
+    prior_reinvestment = None
+    if prior_state is not None:
+        prior_prices = np.array([prior_state.get(sec, {}).get("last_price", np.nan) for sec in securities], dtype=np.float64)
+        prior_reinvestment = np.array([prior_state.get(sec, {}).get("last_reinvestment", np.nan) for sec in securities], dtype=np.float64)
 
-            if total_returns_matrix.empty:
-                total_returns_matrix = security_tr[['Dates']] # can be a potential flaw. data goes as far back as the first security
-                total_returns_matrix[sec] = total_returns_matrix['Dates'].map(dict(zip(security_tr['Dates'], security_tr[sec])))
-            else:
-                total_returns_matrix[sec] = total_returns_matrix['Dates'].map(dict(zip(security_tr['Dates'], security_tr[sec])))
+    dvd_reinvestment, total_return_price = total_return_engine(price_panel.to_numpy(), dvd_panel.to_numpy(), prior_prices, prior_reinvestment)
+
+    # the prior total return price of the first row comes from the previous run
+    lagged_total_return_price = np.vstack([np.full((1, len(securities)), np.nan) if prior_prices is None else (prior_prices + np.nan_to_num(prior_reinvestment))[None, :], total_return_price])
+    lagged_total_return_price = pd.DataFrame(lagged_total_return_price).ffill().to_numpy()[:-1]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        daily_returns = (total_return_price - lagged_total_return_price) / total_return_price
+    daily_returns = pd.DataFrame(daily_returns, index=price_panel.index, columns=securities).where(price_panel.notna())
+
+    state = {} if prior_state is None else dict(prior_state)
+    priced = price_panel.notna().to_numpy()
+    for j, sec in enumerate(securities):
+        if priced[:, j].any():
+            last_row = len(priced) - 1 - priced[::-1, j].argmax()
+            state[sec] = {"last_date": price_panel.index[last_row].strftime("%Y-%m-%d"), "last_price": float(price_panel.iat[last_row, j]), "last_reinvestment": float(dvd_reinvestment[last_row, j])}
+    return daily_returns, state
+
+
+def _build_returns_matrix(sec_list:list, start_date:dt.datetime, end_date:dt.datetime, source) -> tuple:
+    """
+    Calculates the total returns matrix from the first row of the market data
+    :param source: market data source, see market_data_lib
+    :return: tuple of the total returns matrix and the state needed to extend it
+    """
+
+    securities = [sec for sec in sec_list if sec != "cash"]
+
+    # load the dividends once and the prices in bulk for the whole universe
+    dvd_store = dividend_store(dvd_data=source.load_dividends(securities))
+    sec_prices = source.load_prices(securities, start_date, end_date)
+
+    price_panel = {}
+    dvd_panel = {}
+    matrix_dates = None
+    for sec in securities:
+        prof.count("securities_loaded")
+        sec_data = merge_dividends(sec_prices[sec], retrieve_dvd_data(sec, start_date, end_date, dvd_store=dvd_store))
+        sec_dates = pd.to_datetime(sec_data["Dates"])
+        if matrix_dates is None:
+            matrix_dates = pd.Series(sec_data["Dates"].to_numpy(), index=sec_dates) # can be a potential flaw. data goes as far back as the first security
+        price_panel[sec] = pd.Series(sec_data["PX_LAST"].to_numpy(dtype=np.float64), index=sec_dates)
+        dvd_panel[sec] = pd.Series(pd.to_numeric(sec_data["dvd_amount"].replace("", np.nan)).to_numpy(dtype=np.float64), index=sec_dates)
+
+    # align every security on the union of dates and calculate the total returns in one call
+    price_panel = pd.DataFrame(price_panel).sort_index()
+    dvd_panel = pd.DataFrame(dvd_panel).reindex(price_panel.index)
+    daily_returns, sec_state = _panel_returns(price_panel, dvd_panel)
+
+    total_returns_matrix = daily_returns.reindex(matrix_dates.index)
+    total_returns_matrix.index = pd.Index(matrix_dates.to_numpy(), name="Dates")
+    if "cash" in sec_list:
+        total_returns_matrix['cash'] = 0
 
     #forward fill and back fill returns
-    for col in total_returns_matrix.columns:
-        total_returns_matrix[col] = total_returns_matrix[col].ffill()
-        total_returns_matrix[col] = total_returns_matrix[col].bfill()
+    total_returns_matrix = total_returns_matrix.ffill().bfill().iloc[1:]
+
+    state = {"last_date": matrix_dates.index[-1].strftime("%Y-%m-%d"), "last_row": total_returns_matrix.iloc[-1].astype(float).tolist(), "securities": sec_state}
+    return total_returns_matrix, state
+
+
+def _extend_returns_matrix(sec_list:list, state:dict, appended:dict, file_states:dict, start_date:dt.datetime, end_date:dt.datetime, data_dir:str) -> tuple:
+    """
+    Calculates only the dates that were appended to the market data files, continuing from the cached state
+    :param sec_list: list of securities in the returns matrix
+    :param state: cached state of the returns matrix
+    :param appended: dictionary of source file to the byte offset where its new rows begin
+    :param file_states: source file states captured before reading
+    :return: tuple of the new rows of the returns matrix and the updated state. (None, None) if the new rows cannot be appended and the matrix has to be rebuilt
+    """
+
+    securities = [sec for sec in sec_list if sec != "cash"]
+    last_date = pd.Timestamp(state["last_date"])
+    _end_date = dt.datetime.now() if end_date is None else end_date
+
+    # new dividends for dates that are already in the cache change the cached returns
+    dvd_fname = os.path.abspath(os.path.join(data_dir, "dividends.csv"))
+    if dvd_fname in appended:
+        new_dvd = _read_appended_rows(dvd_fname, appended[dvd_fname], file_states[dvd_fname]["size"])
+        new_dvd = new_dvd[new_dvd["ticker"].isin(securities)]
+        new_dvd_dates = pd.to_datetime(new_dvd["ex_date"])
+        for sec, ex_date in zip(new_dvd["ticker"], new_dvd_dates):
+            if (start_date is None or ex_date >= start_date) and ex_date <= pd.Timestamp(state["securities"].get(sec, {}).get("last_date", state["last_date"])):
+                return None, None
+
+    dvd_store = None
+    price_panel = {}
+    dvd_panel = {}
+    matrix_dates = None
+    for sec in securities:
+        mkt_data_fname = os.path.abspath(os.path.join(data_dir, f"{sec.split(' ')[0]}.csv"))
+        if mkt_data_fname not in appended:
+            new_rows = pd.DataFrame(columns=["Dates", "PX_LAST"])
+        else:
+            new_rows = _read_appended_rows(mkt_data_fname, appended[mkt_data_fname], file_states[mkt_data_fname]["size"])
+        sec_dates = pd.to_datetime(new_rows["Dates"])
+        if (sec_dates <= last_date).any():
+            return None, None
+        new_rows = new_rows[sec_dates <= _end_date]
+        sec_dates = sec_dates[sec_dates <= _end_date]
+        if matrix_dates is None:
+            matrix_dates = pd.Series(new_rows["Dates"].to_numpy(), index=sec_dates)
+        elif len(sec_dates) > 0 and (len(matrix_dates) == 0 or sec_dates.max() > matrix_dates.index.max()):
+            # the first security sets the dates of the matrix, it cannot lag behind the others
+            return None, None
+        if new_rows.empty:
+            continue
+
+        if dvd_store is None:
+            dvd_store = dividend_store(data_dir)
+        dvd_file = retrieve_dvd_data(sec, start_date, end_date, data_dir, dvd_store)
+        price_panel[sec] = pd.Series(new_rows["PX_LAST"].to_numpy(dtype=np.float64), index=sec_dates)
+        dvd_panel[sec] = pd.Series(new_rows["Dates"].map(dict(zip(dvd_file["ex_date"], dvd_file["dvd_amount"]))).to_numpy(dtype=np.float64) if not dvd_file.empty else np.nan, index=sec_dates)
+
+    state = dict(state)
+    columns = securities + (["cash"] if "cash" in sec_list else [])
+    if matrix_dates is None or matrix_dates.empty:
+        return pd.DataFrame(columns=columns, index=pd.Index([], name="Dates"), dtype=np.float64), state
+
+    price_panel = pd.DataFrame(price_panel, columns=securities).sort_index()
+    dvd_panel = pd.DataFrame(dvd_panel, columns=securities).reindex(price_panel.index)
+    daily_returns, sec_state = _panel_returns(price_panel, dvd_panel, state["securities"])
+
+    # forward fill from the last cached row
+    new_rows = daily_returns.reindex(matrix_dates.index)
+    if "cash" in sec_list:
+        new_rows['cash'] = 0.0
+    new_rows = pd.concat([pd.DataFrame([state["last_row"]], columns=columns), new_rows.reset_index(drop=True)]).ffill().iloc[1:]
+    new_rows.index = pd.Index(matrix_dates.to_numpy(), name="Dates")
+
+    state["last_date"] = matrix_dates.index[-1].strftime("%Y-%m-%d")
+    state["last_row"] = new_rows.iloc[-1].astype(float).tolist()
+    state["securities"] = sec_state
+    return new_rows, state
+
+
+@prof.timed("load_data")
+def _read_appended_rows(fname:str, start_offset:int, end_offset:int) -> pd.DataFrame:
+    """
+    Reads the rows of a csv file between two byte offsets, using the header of the file
+    """
+
+    with open(fname, "rb") as f:
+        header = f.readline()
+        f.seek(start_offset)
+        appended_bytes = f.read(end_offset - start_offset)
+    return pd.read_csv(io.BytesIO(header + appended_bytes))
+
+class ReturnsMatrix():
+    def __init__(self, values:np.ndarray, dates:np.ndarray, columns:list, column_index:dict=None):
+        """
+        Array backed total returns matrix. The returns are held in one contiguous float64 array (dates x securities) with an int64 vector of date ordinals
+        (days since 1970-01-01) and a ticker to column map. Date windows are found with a binary search and returned as views of the same arrays.
+
+        :param values: 2-D array of returns (dates x securities)
+        :param dates: date ordinals of the rows, sorted ascending
+        :param columns: list of the tickers in column order
+        :param column_index: optional, ticker to column map. built from columns by default
+
+        Last Updated October 18, 2026
+        """
+
+        self.values = np.ascontiguousarray(values, dtype=np.float64)
+        self.dates = np.asarray(dates, dtype=np.int64)
+        self.columns = list(columns)
+        self.column_index = {ticker: j for j, ticker in enumerate(self.columns)} if column_index is None else column_index
+
+    @classmethod
+    def from_frame(cls, tr_matrix:pd.DataFrame):
+        """
+        :param tr_matrix: total returns matrix indexed by date, as returned by calc_returns_matrix
+        :return: ReturnsMatrix with the same returns
+        """
+
+        dates = pd.to_datetime(tr_matrix.index).values.astype("datetime64[D]").astype(np.int64)
+        return cls(tr_matrix.to_numpy(dtype=np.float64), dates, tr_matrix.columns.tolist())
+
+    @staticmethod
+    def date_ordinal(date) -> int:
+        """
+        :param date: date as a string, datetime or timestamp
+        :return: number of days since 1970-01-01
+        """
+
+        return int(np.datetime64(pd.Timestamp(date).normalize(), "D").astype(np.int64))
+
+    @property
+    def index(self) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(self.dates.astype("datetime64[D]"), name="Dates")
+
+    @property
+    def shape(self) -> tuple:
+        return self.values.shape
+
+    def __len__(self):
+        return len(self.dates)
+
+    def window(self, start_date=None, end_date=None, include_start:bool=True, include_end:bool=True):
+        """
+        Slice the returns between two dates without copying
+        :param start_date: first date of the window. by default the window starts at the first date
+        :param end_date: last date of the window. by default the window ends at the last date
+        :param include_start: if False the start date itself is excluded
+        :param include_end: if False the end date itself is excluded
+        :return: ReturnsMatrix that is a view of this one
+        """
+
+        first_row = 0 if start_date is None else self.dates.searchsorted(self.date_ordinal(start_date), side="left" if include_start else "right")
+        last_row = len(self.dates) if end_date is None else self.dates.searchsorted(self.date_ordinal(end_date), side="right" if include_end else "left")
+        last_row = max(first_row, last_row)
+        return ReturnsMatrix(self.values[first_row:last_row], self.dates[first_row:last_row], self.columns, self.column_index)
+
+    def column(self, ticker:str) -> np.ndarray:
+        return self.values[:, self.column_index[ticker]]
+
+    @prof.timed("covariance")
+    def cov(self) -> pd.DataFrame:
+        """
+        :return: sample covariance matrix of the returns, same as DataFrame.cov()
+        """
+
+        return pd.DataFrame(np.atleast_2d(np.cov(self.values, rowvar=False)), index=self.columns, columns=self.columns)
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        :return: total returns matrix as a DataFrame indexed by date strings, as returned by calc_returns_matrix
+        """
+
+        return pd.DataFrame(self.values, index=pd.Index(self.index.strftime("%Y-%m-%d"), name="Dates"), columns=self.columns)
+
+
+def as_returns_matrix(tr_matrix) -> ReturnsMatrix:
+    """
+    :param tr_matrix: total returns matrix as a DataFrame or a ReturnsMatrix
+    :return: the total returns matrix as a ReturnsMatrix
+    """
+
+    if isinstance(tr_matrix, ReturnsMatrix):
+        return tr_matrix
+    return ReturnsMatrix.from_frame(tr_matrix)
 
-    return total_returns_matrix.set_index('Dates').iloc[1:]
 
-def calc_portfolio_period_return(start_date:dt.datetime, end_date:dt.datetime, ticker_weights: dict, tr_matrix:pd.DataFrame) -> dict:
+@prof.timed("drift")
+def calc_period_growth(dates_list:list, tickers:list, tr_matrix:ReturnsMatrix) -> np.ndarray:
+    """
+    Calculates the growth factor (1 + period return) of each ticker between every pair of consecutive dates. A period covers the returns after its start date up to and including its end date.
+
+    :param dates_list: sorted list of dates
+    :param tickers: list of tickers
+    :param tr_matrix: total returns matrix, as a ReturnsMatrix or a DataFrame
+    :return: array of growth factors (periods x tickers). tickers that are not in the returns matrix are NaN
+
+    Last Updated October 18, 2026
+    """
+
+    tr_matrix = as_returns_matrix(tr_matrix)
+    num_periods = max(len(dates_list) - 1, 0)
+    growth = np.full((num_periods, len(tickers)), np.nan)
+    if num_periods == 0:
+        return growth
+
+    # rows of each period are [period_rows[k], period_rows[k+1])
+    date_ordinals = pd.DatetimeIndex(dates_list).normalize().values.astype("datetime64[D]").astype(np.int64)
+    period_rows = tr_matrix.dates.searchsorted(date_ordinals, side="right")
+    cols = np.array([tr_matrix.column_index.get(t, -1) for t in tickers], dtype=np.int64)
+    in_matrix = cols >= 0
+
+    # multiply the returns within each period in one pass
+    gross_returns = 1 + tr_matrix.values[period_rows[0]:period_rows[-1]][:, cols[in_matrix]]
+    period_growth = np.ones((num_periods, int(in_matrix.sum())))
+    has_rows = period_rows[1:] > period_rows[:-1]
+    if has_rows.any():
+        period_growth[has_rows] = np.multiply.reduceat(gross_returns, period_rows[:-1][has_rows] - period_rows[0], axis=0)
+    growth[:, in_matrix] = period_growth
+    return growth
+
+
+@prof.timed("drift")
+def drift_weights(initial_weights:np.ndarray, growth:np.ndarray) -> tuple:
+    """
+    Buy and hold drift of a portfolio. The end weights of each period are the initial weights grown by the cumulative growth factors and normalized, which are the start weights of the next period.
+
+    :param initial_weights: array of the initial weights of each ticker
+    :param growth: array of growth factors (periods x tickers), see calc_period_growth
+    :return: tuple of the start weights and end weights arrays (periods x tickers)
+
+    Last Updated October 18, 2026
+    """
+
+    initial_weights = np.asarray(initial_weights, dtype=np.float64)
+    end_values = initial_weights * np.cumprod(growth, axis=0)
+    end_wt = end_values / np.nansum(end_values, axis=1, keepdims=True)
+    start_wt = np.vstack([initial_weights[None, :], end_wt[:-1]])
+    return start_wt, end_wt
+
+
+def _port_return_frame(sorted_dates:pd.DatetimeIndex, tickers:list, start_wt:np.ndarray, growth:np.ndarray, end_wt:np.ndarray) -> pd.DataFrame:
+    """
+    Builds the long format (one row per period and ticker) output of calc_port_return in one allocation
+    """
+
+    num_periods, num_tickers = growth.shape
+    return pd.DataFrame({
+        "ticker": np.tile(np.asarray(tickers, dtype=object), num_periods),
+        "start_wt": start_wt.ravel(),
+        "start_date": np.repeat(sorted_dates[:-1], num_tickers),
+        "end_date": np.repeat(sorted_dates[1:], num_tickers),
+        "period_return": growth.ravel() - 1,
+        "end_wt": end_wt.ravel(),
+    }, index=np.tile(np.arange(num_tickers), num_periods))
+
+
+def calc_portfolio_period_return(start_date:dt.datetime, end_date:dt.datetime, ticker_weights: dict, tr_matrix:ReturnsMatrix) -> dict:
     """
     Calculates the portfolios total return and its ending weights.
 
     :param start_date: start date which returns are anchored to.
     :param end_date: end date.
     :param ticker_weights: dictionary with the ticker and its initial weights
-    :param tr_matrix: total returns matrix
+    :param tr_matrix: total returns matrix, as a ReturnsMatrix or a DataFrame
     :return: dataframe of each securities period return and its drifted weight. Can derive the total portfolio return by taking the sumproduct of the initial weights and the (1 + period returns)
 
-    Last Updated June 08 2024
+    Last Updated October 18, 2026
     """
 
-    return_attribution = pd.DataFrame(data=list(ticker_weights.keys()), columns=["ticker"])
-    return_attribution["start_wt"] = return_attribution["ticker"].map(ticker_weights)
+    tickers = list(ticker_weights.keys())
+    growth = calc_period_growth([start_date, end_date], tickers, tr_matrix)
+    start_wt, end_wt = drift_weights(np.array([ticker_weights[t] for t in tickers], dtype=np.float64), growth)
+
+    return_attribution = pd.DataFrame(data=tickers, columns=["ticker"])
+    return_attribution["start_wt"] = start_wt[0]
     return_attribution["start_date"] = start_date
     return_attribution["end_date"] = end_date
-
-    tr_matrix = tr_matrix.reset_index()
-    tr_matrix["Dates"] = pd.to_datetime(tr_matrix["Dates"])
-
-    # only take the relevant returns in the timeframe
-    tr_matrix_subset = tr_matrix[(tr_matrix["Dates"] > start_date) & (tr_matrix["Dates"] <= end_date)]
-
-    period_return = {}
-    for col in tr_matrix_subset.columns:
-        if col in list(ticker_weights.keys()):
-            period_return[col] = (1+tr_matrix_subset[col]).prod()-1
-
-    return_attribution["period_return"] = return_attribution["ticker"].map(period_return)
-    return_attribution["end_wt"] = (1+return_attribution["period_return"])*return_attribution["start_wt"] / ((1+return_attribution["period_return"])*return_attribution["start_wt"]).sum()
+    return_attribution["period_return"] = growth[0] - 1
+    return_attribution["end_wt"] = end_wt[0]
     return return_attribution
 
-def calc_port_return(dates_list:list, initial_ticker_weights: dict, tr_matrix:pd.DataFrame) -> dict:
+def calc_port_return(dates_list:list, initial_ticker_weights: dict, tr_matrix:ReturnsMatrix) -> dict:
     """
-    Calculates the portfolios total return and its ending weights.
+    Calculates the portfolios total return and its ending weights. The weights drift with the returns between the dates, which is computed for all dates at once from cumulative growth factors.
 
     :param dates_list: list of dates to calculate returns off of. the minimum date is the start date which returns are anchored to.
     :param ticker_weights: dictionary with the ticker and its initial weights
-    :param tr_matrix: total returns matrix
+    :param tr_matrix: total returns matrix, as a ReturnsMatrix or a DataFrame
     :return: dataframe of each securities period return and its drifted weight. Can derive the total portfolio return by taking the sumproduct of the initial weights and the (1 + period returns)
 
-    Last Updated June 08 2024
+    Last Updated October 18, 2026
     """
 
-    all_port_returns = pd.DataFrame()
-    sorted_dates = sorted(dates_list)
-    for idx, _start_d in enumerate(sorted_dates):
-        if _start_d == max(dates_list):
-            break
+    sorted_dates = pd.DatetimeIndex(dates_list).sort_values()
+    if len(sorted_dates) < 2:
+        return pd.DataFrame()
+
+    tickers = list(initial_ticker_weights.keys())
+    growth = calc_period_growth(sorted_dates, tickers, tr_matrix)
+    start_wt, end_wt = drift_weights(np.array([initial_ticker_weights[t] for t in tickers], dtype=np.float64), growth)
+    return _port_return_frame(sorted_dates, tickers, start_wt, growth, end_wt)
+
+class covariance_estimator():
+    def __init__(self, num_assets:int=None, columns:list=None, mode:str="expanding", window:int=None, decay:float=None, halflife:float=None):
+        """
+        Covariance matrix that is updated one day at a time instead of being recalculated from the full history. Each update is a rank-1 change of
+        running means and co-moments (Welford), so a daily step costs O(n^2) in the number of assets.
+
+        :param num_assets: number of assets. by default the length of columns
+        :param columns: optional, list of tickers. if provided cov() returns a DataFrame indexed by them
+        :param mode: "expanding" uses every day that was added, "rolling" uses the last window days, "ewma" exponentially weights the days
+        :param window: number of days in the rolling window
+        :param decay: ewma decay factor (lambda), the weight of the prior covariance. ie. 0.94
+        :param halflife: ewma half-life in days, alternative to decay
+
+        Last Updated October 18, 2026
+        """
+
+        if num_assets is None:
+            if columns is None:
+                raise ValueError("Error: Please provide the number of assets or the list of columns.")
+            num_assets = len(columns)
+        if mode == "rolling" and (window is None or window < 2):
+            raise ValueError("Error: A rolling covariance needs a window of at least 2 days.")
+        if mode == "ewma":
+            if decay is None:
+                if halflife is None:
+                    raise ValueError("Error: An ewma covariance needs a decay or a halflife.")
+                decay = 0.5 ** (1 / halflife)
+        elif mode not in ("expanding", "rolling"):
+            raise ValueError(f"Error: Unknown covariance mode: {mode}. Please use expanding, rolling or ewma.")
+
+        self.num_assets = num_assets
+        self.columns = None if columns is None else list(columns)
+        self.mode = mode
+        self.window = window
+        self.decay = decay
+
+        self.count = 0
+        self.mean = np.zeros(num_assets)
+        self.comoment = np.zeros((num_assets, num_assets)) # sum of the cross products of the deviations from the mean. ewma stores the covariance itself
+        if mode == "rolling":
+            self._window_rows = np.empty((window, num_assets))
+            self._rows_added = 0
+
+    @prof.timed("covariance_update")
+    def update(self, x:np.ndarray) -> None:
+        """
+        Adds one day of returns. A rolling window drops its oldest day once it is full.
+        :param x: array of the returns of each asset
+        """
 
-        if _start_d == min(dates_list):
-            period_return = calc_portfolio_period_return(start_date=_start_d, end_date=sorted_dates[idx+1], ticker_weights=initial_ticker_weights, tr_matrix=tr_matrix)
+        x = np.asarray(x, dtype=np.float64)
+        if self.mode == "ewma":
+            if self.count == 0:
+                self.mean = x.copy()
+            else:
+                _deviation = x - self.mean
+                self.mean += (1 - self.decay) * _deviation
+                self.comoment = self.decay * (self.comoment + (1 - self.decay) * np.outer(_deviation, _deviation))
+            self.count += 1
+            return
+
+        if self.mode == "rolling":
+            # the slot of the oldest day is overwritten once the window is full
+            _slot = self._rows_added % self.window
+            if self.count == self.window:
+                self.downdate(self._window_rows[_slot])
+            self._window_rows[_slot] = x
+            self._rows_added += 1
+
+        self.count += 1
+        _deviation = x - self.mean
+        self.mean += _deviation / self.count
+        self.comoment += np.outer(_deviation, _deviation) * ((self.count - 1) / self.count)
+
+    def downdate(self, x:np.ndarray) -> None:
+        """
+        Removes one day of returns that was previously added
+        :param x: array of the returns of each asset
+        """
+
+        x = np.asarray(x, dtype=np.float64)
+        if self.count <= 1:
+            self.count = 0
+            self.mean = np.zeros(self.num_assets)
+            self.comoment = np.zeros((self.num_assets, self.num_assets))
+            return
+
+        _mean = (self.count * self.mean - x) / (self.count - 1)
+        _deviation = x - _mean
+        self.comoment -= np.outer(_deviation, _deviation) * ((self.count - 1) / self.count)
+        self.mean = _mean
+        self.count -= 1
+
+    @prof.timed("covariance_add")
+    def add(self, rows:np.ndarray) -> None:
+        """
+        Adds several days of returns. An expanding covariance merges the days in one batch, otherwise they are added one at a time.
+        :param rows: 2-D array of returns (days x assets)
+        """
+
+        rows = np.asarray(rows, dtype=np.float64).reshape(-1, self.num_assets)
+        if len(rows) == 0:
+            return
+        if self.mode != "expanding" or len(rows) == 1:
+            for x in rows:
+                self.update(x)
+            return
+
+        # merge the batch mean and co-moments with the running ones
+        _count = self.count + len(rows)
+        _batch_mean = rows.mean(axis=0)
+        _batch_deviation = rows - _batch_mean
+        _delta = _batch_mean - self.mean
+        self.comoment += _batch_deviation.T @ _batch_deviation + np.outer(_delta, _delta) * (self.count * len(rows) / _count)
+        self.mean += _delta * (len(rows) / _count)
+        self.count = _count
+
+    def fit(self, tr_matrix) -> None:
+        """
+        Adds every day of a returns matrix
+        :param tr_matrix: total returns matrix, as a ReturnsMatrix or a DataFrame
+        """
+
+        self.add(as_returns_matrix(tr_matrix).values)
+
+    def get_state(self) -> dict:
+        """
+        :return: dictionary of the settings and running sums of the estimator, so it can be saved between runs and restored with from_state.
+                 the values are either arrays or json serializable
+        """
+
+        state = {"num_assets": self.num_assets, "columns": self.columns, "mode": self.mode, "window": self.window, "decay": self.decay,
+                 "count": self.count, "mean": self.mean.copy(), "comoment": self.comoment.copy()}
+        if self.mode == "rolling":
+            state["window_rows"] = self._window_rows.copy()
+            state["rows_added"] = self._rows_added
+        return state
+
+    @classmethod
+    def from_state(cls, state:dict):
+        """
+        :param state: dictionary from get_state
+        :return: covariance_estimator that continues from the saved state
+        """
+
+        estimator = cls(num_assets=int(state["num_assets"]), columns=state["columns"], mode=state["mode"], window=state["window"], decay=state["decay"])
+        estimator.count = int(state["count"])
+        estimator.mean = np.array(state["mean"], dtype=np.float64)
+        estimator.comoment = np.array(state["comoment"], dtype=np.float64)
+        if estimator.mode == "rolling":
+            estimator._window_rows = np.array(state["window_rows"], dtype=np.float64)
+            estimator._rows_added = int(state["rows_added"])
+        return estimator
+
+    def cov(self):
+        """
+        :return: the covariance matrix, same as DataFrame.cov() over the days in the estimator. A DataFrame if the columns were provided
+        """
+
+        if self.mode == "ewma":
+            cov_matrix = self.comoment.copy()
+        elif self.count < 2:
+            cov_matrix = np.full((self.num_assets, self.num_assets), np.nan)
         else:
-            prior_portfolio = period_return
-            prior_port_weights = dict(zip(prior_portfolio["ticker"], prior_portfolio["end_wt"]))
-            period_return = calc_portfolio_period_return(start_date=_start_d, end_date=sorted_dates[idx+1], ticker_weights=prior_port_weights, tr_matrix=tr_matrix)
+            cov_matrix = self.comoment / (self.count - 1)
+
+        if self.columns is None:
+            return cov_matrix
+        return pd.DataFrame(cov_matrix, index=self.columns, columns=self.columns)
+
 
-        if all_port_returns.empty:
-            all_port_returns = period_return
+def rebalance_schedule(dates_list:list, rebalance="daily") -> np.ndarray:
+    """
+    Flags the dates on which the portfolio is rebalanced. The first date is always a rebalance date.
+
+    :param dates_list: sorted list of dates
+    :param rebalance: "daily", "weekly" (first date of each week), "monthly" (first date of each month), a list of custom dates (each moved to the first date on or after it), or None to buy and hold
+    :return: boolean array, True where the portfolio is rebalanced
+
+    Last Updated October 18, 2026
+    """
+
+    dates = pd.DatetimeIndex(dates_list)
+    if isinstance(rebalance, str):
+        if rebalance == "daily":
+            is_rebalance = np.ones(len(dates), dtype=bool)
+        elif rebalance in ("weekly", "monthly"):
+            periods = dates.to_period("W" if rebalance == "weekly" else "M").asi8
+            is_rebalance = np.append(True, periods[1:] != periods[:-1])
         else:
-            all_port_returns = pd.concat([all_port_returns, period_return])
+            raise ValueError(f"Error: Unknown rebalance schedule: {rebalance}. Please use daily, weekly, monthly or a list of dates.")
+    else:
+        is_rebalance = np.zeros(len(dates), dtype=bool)
+        if rebalance is not None and len(rebalance) > 0:
+            rebalance_rows = dates.searchsorted(pd.DatetimeIndex(rebalance).normalize())
+            is_rebalance[rebalance_rows[rebalance_rows < len(dates)]] = True
+    if len(dates) > 0:
+        is_rebalance[0] = True
+    return is_rebalance
+
+
+@prof.timed("backtest")
+def run_backtest(tr_matrix:ReturnsMatrix, dates_list:list, benchmark_weights:dict, target_weights, rebalance="daily") -> tuple:
+    """
+    Backtests a portfolio that is rebalanced to its target weights on a schedule and drifts with the returns in between, against a buy and hold benchmark.
 
-    return all_port_returns
+    :param tr_matrix: total returns matrix, as a ReturnsMatrix or a DataFrame
+    :param dates_list: list of dates to calculate returns off of. the minimum date is the start date which returns are anchored to.
+    :param benchmark_weights: dictionary with the ticker and its initial benchmark weights
+    :param target_weights: dictionary of fixed target weights, or a function f(rebalance_date, benchmark_weights, history) that returns the target weights dictionary,
+                           where benchmark_weights are the drifted benchmark weights on that date and history is the ReturnsMatrix of the dates before it
+    :param rebalance: rebalance schedule, see rebalance_schedule
+    :return: tuple of a dataframe of the start_date, end_date, bench, portfolio and active (portfolio - bench) returns of every period, and the standard deviation of the active returns
+
+    Last Updated October 18, 2026
+    """
+
+    tr_matrix = as_returns_matrix(tr_matrix)
+    sorted_dates = pd.DatetimeIndex(dates_list).sort_values()
+    num_periods = max(len(sorted_dates) - 1, 0)
+    tickers = list(benchmark_weights.keys())
+    ticker_index = {t: j for j, t in enumerate(tickers)}
+
+    growth = calc_period_growth(sorted_dates, tickers, tr_matrix)
+    bench_wt, _ = drift_weights(np.array([benchmark_weights[t] for t in tickers], dtype=np.float64), growth)
+
+    # drift the portfolio from each rebalance date to the next
+    port_wt = np.empty((num_periods, len(tickers)))
+    rebalance_rows = np.flatnonzero(rebalance_schedule(sorted_dates[:-1], rebalance))
+    for first_row, last_row in zip(rebalance_rows, np.append(rebalance_rows[1:], num_periods)):
+        if callable(target_weights):
+            _target = target_weights(sorted_dates[first_row], dict(zip(tickers, bench_wt[first_row])), tr_matrix.window(end_date=sorted_dates[first_row], include_end=False))
+        else:
+            _target = target_weights
+
+        _target_wt = np.zeros(len(tickers))
+        for ticker, wt in _target.items():
+            if ticker not in ticker_index:
+                raise ValueError(f"Error: {ticker} is not in the benchmark universe.")
+            _target_wt[ticker_index[ticker]] = wt
+        port_wt[first_row:last_row], _ = drift_weights(_target_wt, growth[first_row:last_row])
+
+    backtest_returns = pd.DataFrame({"start_date": sorted_dates[:-1], "end_date": sorted_dates[1:]})
+    backtest_returns["bench"] = np.nansum(bench_wt * (growth - 1), axis=1)
+    backtest_returns["portfolio"] = np.nansum(port_wt * (growth - 1), axis=1)
+    backtest_returns["active"] = backtest_returns["portfolio"] - backtest_returns["bench"]
+    return backtest_returns, backtest_returns["active"].std()
 
 if __name__ == '__main__':
     banks_list = ["BNS CN", "BMO CN", "TD CN", "CM CN", "RY CN", "NA CN"]
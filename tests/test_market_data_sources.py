@@ -0,0 +1,58 @@
+import os.path
+import sqlite3
+import datetime as dt
+import pandas as pd
+import pytest
+import market_data_lib as mkt
+import statistics_lib as stat
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), mkt.MARKET_DATA_DIR)
+SEC_LIST = ["BNS CN", "BMO CN", "TD CN", "CM CN", "RY CN", "NA CN", "cash"]
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(os.path.join(tmp_path, "market_data.db"))
+    mkt.create_tables(conn)
+    mkt.ingest_csv(conn, data_dir=DATA_DIR)
+    yield conn
+    conn.close()
+
+
+def table_rows(conn, table:str) -> pd.DataFrame:
+    return pd.read_sql_query(f"SELECT * FROM {table}", conn).sort_values(["ticker", "Dates" if table == mkt.PRICE_TABLE else "ex_date"]).reset_index(drop=True)
+
+
+@pytest.mark.parametrize("start_date, end_date", [
+    (dt.datetime(2018, 11, 16), None),
+    (dt.datetime(2023, 1, 10), None),
+    (dt.datetime(2020, 3, 2, 15), dt.datetime(2022, 6, 30, 12)),
+    (None, dt.datetime(2021, 1, 4)),
+])
+@pytest.mark.parametrize("chunksize, batch_size", [(100000, 1000), (500, 2)])
+def test_sql_source_matches_csv(conn, start_date, end_date, chunksize, batch_size):
+    # small chunks split a ticker's rows across chunks and small batches split the tickers across queries
+    csv_matrix = stat.calc_returns_matrix(list(SEC_LIST), start_date=start_date, end_date=end_date, data_dir=DATA_DIR, use_cache=False)
+    source = mkt.sql_source(conn, chunksize=chunksize, batch_size=batch_size)
+    sql_matrix = stat.calc_returns_matrix(list(SEC_LIST), start_date=start_date, end_date=end_date, source=source)
+    pd.testing.assert_frame_equal(sql_matrix, csv_matrix)
+
+
+def test_ingest_is_idempotent(conn):
+    prices = table_rows(conn, mkt.PRICE_TABLE)
+    dividends = table_rows(conn, mkt.DIVIDEND_TABLE)
+    rows = mkt.ingest_csv(conn, data_dir=DATA_DIR)
+
+    assert rows == {"prices": len(prices), "dividends": len(dividends)}
+    pd.testing.assert_frame_equal(table_rows(conn, mkt.PRICE_TABLE), prices)
+    pd.testing.assert_frame_equal(table_rows(conn, mkt.DIVIDEND_TABLE), dividends)
+
+
+def test_sql_source_tickers_and_dividends(conn):
+    source = mkt.sql_source(conn)
+    assert source.tickers() == sorted(sec for sec in SEC_LIST if sec != "cash")
+    assert len(source.load_dividends()) == len(mkt.csv_source(DATA_DIR).load_dividends())
+
+
+def test_sql_source_missing_ticker(conn):
+    with pytest.raises(ValueError):
+        mkt.sql_source(conn).load_prices(["XX CN"])
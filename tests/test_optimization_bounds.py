@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+import optimization_lib as opt
+
+SEC_LIST = ["BNS CN", "BMO CN", "TD CN", "CM CN", "RY CN", "NA CN", "cash"]
+BENCH_WT = {sec: 1/6 for sec in SEC_LIST[:-1]} | {"cash": 0.0}
+
+
+def test_dict_bound_keeps_the_default_bound():
+    lower_bounds, upper_bounds = opt.bound_arrays(SEC_LIST, {"RY CN": 0.05, "cash": (0, 0.2)})
+    np.testing.assert_array_equal(lower_bounds, [-0.1, -0.1, -0.1, -0.1, -0.05, -0.1, 0])
+    np.testing.assert_array_equal(upper_bounds, [0.1, 0.1, 0.1, 0.1, 0.05, 0.1, 0.2])
+
+
+def test_dict_bound_keeps_the_session_bound():
+    rng = np.random.default_rng(0)
+    cov_values = np.cov(rng.normal(0, 0.01, (200, len(SEC_LIST) - 1)), rowvar=False)
+    cov_values = np.pad(cov_values, ((0, 1), (0, 1)))
+    optimizer = opt.ActiveRiskOptimizer(bound=0.02)
+    solution = optimizer.solve(BENCH_WT, 0.1, cov_matrix=cov_values, bound={"cash": (0, 0.2)})
+    active_wt = np.array([solution[sec] - BENCH_WT[sec] for sec in SEC_LIST])
+    assert np.all(np.abs(active_wt[:-1]) <= 0.02 + 1e-9)
+    assert active_wt[-1] >= 0.1 - 1e-9
+
+
+def test_inverted_bound():
+    with pytest.raises(ValueError):
+        opt.bound_arrays(SEC_LIST, {"cash": (0.2, 0)})
@@ -0,0 +1,46 @@
+import profiling_lib as prof
+
+
+def square(x:float) -> float:
+    with prof.timer("square"):
+        prof.count("squares")
+        return x*x
+
+
+@prof.timed("nested")
+def nested(depth:int) -> int:
+    return depth if depth == 0 else nested(depth - 1)
+
+
+def test_nested_stage_with_the_same_name_is_recorded_once():
+    prof.enable()
+    try:
+        with prof.timer("outer"):
+            nested(3)
+        timers = prof.report()["timers"]
+    finally:
+        prof.disable()
+    assert timers["nested"]["count"] == 1
+    assert timers["nested"]["total"] <= timers["outer"]["total"]
+
+
+def test_merge_adds_the_worker_profile():
+    prof.enable()
+    try:
+        square(2)
+        worker_result = prof.profiled_call(square, 3) # run in this process, as a pool worker would
+        prof.reset()
+        square(2)
+        result = prof.merge(*worker_result)
+        output = prof.report()
+    finally:
+        prof.disable()
+    assert result == 9
+    assert output["timers"]["square"]["count"] == 2
+    assert output["counters"]["squares"] == 2
+
+
+def test_profiled_call_while_disabled():
+    prof.disable()
+    assert prof.profiled_call(square, 3) == (9, None)
+    assert prof.merge(9, None) == 9
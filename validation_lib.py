@@ -0,0 +1,117 @@
+import math
+import pandas as pd
+import numpy as np
+import statistics_lib as stat
+import optimization_lib as opt
+import profiling_lib as prof
+
+def block_bootstrap_indices(num_days:int, path_length:int, num_paths:int, block_length:int, rng:np.random.Generator) -> np.ndarray:
+    """
+    Circular moving block bootstrap. Each path is made of blocks of consecutive days that start on random days and wrap around the end of the sample,
+    which keeps the autocorrelation and volatility clustering within a block.
+
+    :param num_days: number of days in the sample
+    :param path_length: number of days in each resampled path
+    :param num_paths: number of paths
+    :param block_length: number of consecutive days in each block
+    :param rng: numpy random generator
+    :return: array of day indices (paths x path_length)
+    """
+
+    num_blocks = math.ceil(path_length / block_length)
+    block_starts = rng.integers(0, num_days, size=(num_paths, num_blocks, 1))
+    indices = (block_starts + np.arange(block_length)) % num_days
+    return indices.reshape(num_paths, num_blocks*block_length)[:, :path_length]
+
+
+@prof.timed("bootstrap")
+def bootstrap_active_risk(active_returns:np.ndarray, num_paths:int=10000, block_length:int=20, path_length:int=None, seed:int=0, max_chunk_bytes:int=2**27) -> np.ndarray:
+    """
+    Realized active risk (standard deviation of the active returns) of block bootstrapped paths. The paths are generated and reduced in chunks so that
+    the gathered returns never take more than about max_chunk_bytes of memory.
+
+    :param active_returns: array of daily active returns (days x portfolios)
+    :param num_paths: number of paths
+    :param block_length: number of consecutive days in each block
+    :param path_length: number of days in each path. by default the number of days in active_returns
+    :param seed: seed of the random generator
+    :param max_chunk_bytes: memory budget of each chunk of paths
+    :return: array of the realized active risk of each path (paths x portfolios)
+    """
+
+    active_returns = np.asarray(active_returns, dtype=np.float64).reshape(len(active_returns), -1)
+    num_days, num_portfolios = active_returns.shape
+    path_length = num_days if path_length is None else path_length
+    if num_days < 2 or path_length < 2:
+        raise ValueError("Error: At least 2 days are needed to bootstrap the active risk.")
+
+    rng = np.random.default_rng(seed)
+    # the indices, the gathered returns and the two temporaries of std are each about 8 bytes per day and portfolio of a path
+    chunk_paths = max(1, max_chunk_bytes // (8*path_length*(3*num_portfolios + 1)))
+    realized_risk = np.empty((num_paths, num_portfolios))
+    for first_path in range(0, num_paths, chunk_paths):
+        last_path = min(first_path + chunk_paths, num_paths)
+        indices = block_bootstrap_indices(num_days, path_length, last_path - first_path, block_length, rng)
+        realized_risk[first_path:last_path] = active_returns[indices].std(axis=1, ddof=1)
+    return realized_risk
+
+
+def validate_active_risk(tr_matrix, benchmark_weights:dict, portfolios:dict, cov_matrix, num_paths:int=10000, block_length:int=20, path_length:int=None,
+                         quantiles:tuple=(0.05, 0.95), seed:int=0, max_chunk_bytes:int=2**27) -> pd.DataFrame:
+    """
+    Checks whether the ex-ante active risk predicted by a covariance matrix matches the realized tracking error. The daily active returns of each portfolio
+    over the returns matrix (ie. the testing period) are block bootstrapped into resampled paths and the realized active risk of every path is compared
+    with the prediction sqrt(w'Cw). The portfolios are held at constant weights, as if rebalanced daily.
+
+    The bias statistic of a path is its realized active risk divided by the predicted one. If the prediction is right it is about 1 with a standard error
+    of sqrt(1/(2T)) for T days, and band_coverage is the fraction of paths with a bias statistic within 1 +/- 2 standard errors (about 95% if the
+    model is right and the returns are close to normal).
+
+    :param tr_matrix: returns matrix of the period to validate on, as a ReturnsMatrix or a DataFrame
+    :param benchmark_weights: dictionary of the benchmark weights
+    :param portfolios: dictionary of portfolio name to its weights dictionary
+    :param cov_matrix: covariance matrix that the active risk was predicted with, ie. of the training period. see opt.covariance_matrix
+    :param num_paths: number of bootstrap paths
+    :param block_length: number of consecutive days in each block
+    :param path_length: number of days in each path. by default the number of days in tr_matrix
+    :param quantiles: lower and upper quantiles of the bootstrap bands
+    :param seed: seed of the random generator
+    :param max_chunk_bytes: memory budget of each chunk of paths
+    :return: DataFrame indexed by portfolio with the predicted_risk, realized_risk (of the actual period), bias_ratio (realized / predicted), the mean and
+             quantile bands of the bootstrapped realized risk and bias statistic, and the band_coverage
+
+    Last Updated October 18, 2026
+    """
+
+    tr_matrix = stat.as_returns_matrix(tr_matrix)
+    sec_list = list(benchmark_weights.keys())
+    cov_values = opt.covariance_matrix(sec_list, cov_matrix=cov_matrix)
+
+    # active weights of every portfolio (assets x portfolios), the daily active returns are one matrix product
+    names = list(portfolios.keys())
+    bench_wt = np.array([benchmark_weights[sec] for sec in sec_list], dtype=np.float64)
+    active_wt = np.column_stack([np.array([portfolios[name].get(sec, 0) for sec in sec_list], dtype=np.float64) - bench_wt for name in names])
+    returns = tr_matrix.values[:, [tr_matrix.column_index[sec] for sec in sec_list]]
+    active_returns = returns @ active_wt
+
+    predicted_risk = np.sqrt(np.maximum([opt.portfolio_variance(cov_values, active_wt[:, k]) for k in range(len(names))], 0))
+    realized_risk = active_returns.std(axis=0, ddof=1)
+    path_risk = bootstrap_active_risk(active_returns, num_paths=num_paths, block_length=block_length, path_length=path_length, seed=seed, max_chunk_bytes=max_chunk_bytes)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        bias = path_risk / predicted_risk
+
+    num_days = len(active_returns) if path_length is None else path_length
+    band = 2*math.sqrt(1 / (2*num_days))
+    summary = pd.DataFrame(index=pd.Index(names, name="portfolio"))
+    summary["predicted_risk"] = predicted_risk
+    summary["realized_risk"] = realized_risk
+    with np.errstate(divide="ignore", invalid="ignore"):
+        summary["bias_ratio"] = realized_risk / predicted_risk
+    summary["bootstrap_mean"] = path_risk.mean(axis=0)
+    summary[f"bootstrap_q{quantiles[0]:g}"] = np.quantile(path_risk, quantiles[0], axis=0)
+    summary[f"bootstrap_q{quantiles[1]:g}"] = np.quantile(path_risk, quantiles[1], axis=0)
+    summary["bias_mean"] = bias.mean(axis=0)
+    summary[f"bias_q{quantiles[0]:g}"] = np.quantile(bias, quantiles[0], axis=0)
+    summary[f"bias_q{quantiles[1]:g}"] = np.quantile(bias, quantiles[1], axis=0)
+    summary["band_coverage"] = (np.abs(bias - 1) <= band).mean(axis=0)
+    return summary
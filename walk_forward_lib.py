@@ -0,0 +1,189 @@
+import os.path
+import json
+import hashlib
+import math
+import concurrent.futures
+import pandas as pd
+import numpy as np
+import statistics_lib as stat
+import optimization_lib as opt
+import profiling_lib as prof
+
+WALK_FORWARD_CACHE_DIR = os.path.join(stat.MARKET_DATA_DIR, stat.RETURNS_CACHE_SUBDIR, "walk_forward")
+STRATEGIES = ["default", "default_rebal", "optimized", "optimized_rebal"]
+
+def run_strategies(tr_matrix:stat.ReturnsMatrix, benchmark_weights:dict, cash_drag:float, training_end, testing_start, testing_end=None, solver:str="numpy") -> tuple:
+    """
+    Optimizes on the training period and backtests the four strategies on the testing period:
+    default (keep the cash balance and invest the remaining portion identical to the benchmark, no rebalance), default_rebal (the same rebalanced daily),
+    optimized (minimize the active risk on the training period, no rebalance) and optimized_rebal (minimize the active risk daily on every day up to the
+    rebalance date, the covariance is updated with each new day).
+
+    :param tr_matrix: returns matrix that starts on the first training date, as a ReturnsMatrix or a DataFrame
+    :param benchmark_weights: dictionary of the universe of assets and their benchmark weights. The last asset has to be cash.
+    :param cash_drag: cash drag constraint
+    :param training_end: last date of the training period
+    :param testing_start: first date of the testing period, which the returns are anchored to
+    :param testing_end: optional, last date of the testing period. by default the last date of tr_matrix
+    :param solver: solver backend, "numpy" or "cplex"
+    :return: tuple of a dictionary of strategy name to its (backtest returns DataFrame, active std dev) from stat.run_backtest, and a dictionary of
+             the default_weights, optimized_weights and the solve_log of the daily optimizer
+
+    Last Updated October 18, 2026
+    """
+
+    tr_matrix = stat.as_returns_matrix(tr_matrix)
+    tr_matrix = tr_matrix.window(end_date=testing_end)
+    dt_list = tr_matrix.window(start_date=testing_start).index
+    num_stocks = len([ticker for ticker in benchmark_weights if ticker != "cash"])
+
+    # backtest default no rebalance portfolio
+    default_portfolio_wt = {ticker: cash_drag if ticker == "cash" else wt - (cash_drag/num_stocks) for ticker, wt in benchmark_weights.items()}
+    backtests = {"default": stat.run_backtest(tr_matrix=tr_matrix, dates_list=dt_list, benchmark_weights=benchmark_weights, target_weights=default_portfolio_wt, rebalance=None)}
+
+    # default daily rebalance portfolio, keep the cash balance and invest the remaining portion identical to the benchmark
+    def daily_default_wt(rebal_date, bench_wt, history):
+        return {ticker: cash_drag if ticker == "cash" else wt - (cash_drag/num_stocks) for ticker, wt in bench_wt.items()}
+    backtests["default_rebal"] = stat.run_backtest(tr_matrix=tr_matrix, dates_list=dt_list, benchmark_weights=benchmark_weights, target_weights=daily_default_wt, rebalance="daily")
+
+    # Find the optimized portfolio to replicate the benchmark given the cash drag
+    # backtest optimized no rebalance
+    sol = opt.minimize_active_risk(benchmark_portfolio=benchmark_weights, cash_drag=cash_drag, tr_matrix=tr_matrix.window(end_date=training_end), solver=solver)
+    backtests["optimized"] = stat.run_backtest(tr_matrix=tr_matrix, dates_list=dt_list, benchmark_weights=benchmark_weights, target_weights=sol, rebalance=None)
+
+    # backtest optimized daily rebalance, trains with the most recent dataset. the covariance is updated with each new day rather than recalculated
+    # the optimizer session builds the model once and warm starts each solve from the previous day
+    cov_estimator = stat.covariance_estimator(columns=tr_matrix.columns)
+    optimizer = opt.ActiveRiskOptimizer(solver=solver)
+    def daily_opt_basket(rebal_date, bench_wt, history):
+        cov_estimator.add(history.values[cov_estimator.count:])
+        return opt.minimize_active_risk(benchmark_portfolio=bench_wt, cash_drag=cash_drag, cov_matrix=cov_estimator, optimizer=optimizer)
+    backtests["optimized_rebal"] = stat.run_backtest(tr_matrix=tr_matrix, dates_list=dt_list, benchmark_weights=benchmark_weights, target_weights=daily_opt_basket, rebalance="daily")
+
+    return backtests, {"default_weights": default_portfolio_wt, "optimized_weights": sol, "solve_log": optimizer.solve_log}
+
+
+def walk_forward_folds(dates_list:list, training_days:int, testing_days:int, step_days:int=None, mode:str="rolling") -> list:
+    """
+    Train/test folds that walk forward through the dates. Each testing period starts on the day after its training period ends.
+
+    :param dates_list: sorted list of the dates of the returns matrix
+    :param training_days: number of days in the (first) training period
+    :param testing_days: number of days in each testing period
+    :param step_days: number of days between the starts of consecutive testing periods. by default testing_days so the testing periods do not overlap
+    :param mode: "rolling" keeps the training period at training_days, "expanding" keeps the first training date and grows the training period
+    :return: list of fold dictionaries with the keys fold, train_start, train_end, test_start, test_end
+    """
+
+    if mode not in ("rolling", "expanding"):
+        raise ValueError(f"Error: Unknown walk forward mode: {mode}. Please use rolling or expanding.")
+    if training_days < 2 or testing_days < 2:
+        raise ValueError("Error: The training and testing periods need at least 2 days.")
+    dates = pd.DatetimeIndex(dates_list).strftime("%Y-%m-%d")
+    step_days = testing_days if step_days is None else step_days
+
+    folds = []
+    test_row = training_days
+    while test_row + testing_days <= len(dates):
+        train_row = 0 if mode == "expanding" else test_row - training_days
+        folds.append({"fold": len(folds), "train_start": dates[train_row], "train_end": dates[test_row - 1],
+                      "test_start": dates[test_row], "test_end": dates[test_row + testing_days - 1]})
+        test_row += step_days
+    return folds
+
+
+def fold_key(fold_returns:stat.ReturnsMatrix, params:dict) -> str:
+    """
+    :param fold_returns: returns matrix of the fold, from its first training date to its last testing date
+    :param params: dictionary of the parameters of the fold
+    :return: hash of the fold's returns and parameters, so a fold is only recalculated when its data or parameters change
+    """
+
+    fingerprint = hashlib.sha1()
+    fingerprint.update(np.ascontiguousarray(fold_returns.values).tobytes())
+    fingerprint.update(np.ascontiguousarray(fold_returns.dates).tobytes())
+    fingerprint.update(json.dumps({"columns": fold_returns.columns, "params": params}, sort_keys=True).encode())
+    return fingerprint.hexdigest()[:24]
+
+
+def _run_fold(fold_returns:stat.ReturnsMatrix, fold:dict, benchmark_weights:dict, cash_drag:float, solver:str) -> list:
+    """
+    Runs the strategies of one fold and summarizes their active returns. Runs in the worker processes of walk_forward.
+    :return: list of the rows of the fold, one per strategy
+    """
+
+    backtests, details = run_strategies(fold_returns, benchmark_weights, cash_drag, training_end=fold["train_end"], testing_start=fold["test_start"], solver=solver)
+
+    # the ex-ante active risk of the fixed weight strategies from the training covariance
+    sec_list = list(benchmark_weights.keys())
+    cov_values = opt.covariance_matrix(sec_list, tr_matrix=fold_returns.window(end_date=fold["train_end"]))
+    bench_wt = np.array([benchmark_weights[sec] for sec in sec_list])
+    predicted_risk = {}
+    for name, weights in [("default", details["default_weights"]), ("optimized", details["optimized_weights"])]:
+        active_wt = np.array([weights[sec] for sec in sec_list]) - bench_wt
+        predicted_risk[name] = math.sqrt(max(opt.portfolio_variance(cov_values, active_wt), 0))
+
+    rows = []
+    for name in STRATEGIES:
+        backtest_returns, active_std = backtests[name]
+        rows.append({**fold, "strategy": name, "num_periods": len(backtest_returns), "active_mean": float(backtest_returns["active"].mean()),
+                     "active_std": float(active_std), "active_max_abs": float(backtest_returns["active"].abs().max()),
+                     "predicted_risk": predicted_risk.get(name, float("nan"))})
+    return rows
+
+
+def walk_forward(tr_matrix, benchmark_weights:dict, cash_drag:float, folds:list, solver:str="numpy", max_workers:int=None, cache_dir:str=WALK_FORWARD_CACHE_DIR) -> pd.DataFrame:
+    """
+    Runs the strategies of run_strategies on every train/test fold and consolidates their active risk statistics. The folds run on a process pool
+    and each fold's result is cached on disk by the hash of its returns and parameters, so a re-run only calculates the folds that changed.
+
+    :param tr_matrix: returns matrix of the universe of assets, as a ReturnsMatrix or a DataFrame
+    :param benchmark_weights: dictionary of the universe of assets and their benchmark weights. The last asset has to be cash.
+    :param cash_drag: cash drag constraint
+    :param folds: list of folds, see walk_forward_folds
+    :param solver: solver backend, "numpy" or "cplex"
+    :param max_workers: number of worker processes. by default the number of cores. 1 runs every fold in this process
+    :param cache_dir: folder where the fold results are cached. None disables the cache
+    :return: DataFrame with one row per fold and strategy: the fold dates, strategy, num_periods, active_mean, active_std, active_max_abs,
+             predicted_risk (ex-ante active risk of the fixed weight strategies) and bias_ratio (active_std / predicted_risk)
+
+    Last Updated October 18, 2026
+    """
+
+    tr_matrix = stat.as_returns_matrix(tr_matrix)
+    max_workers = os.cpu_count() if max_workers is None else max_workers
+
+    fold_rows = {}
+    pending = {}
+    for fold in folds:
+        fold_returns = tr_matrix.window(start_date=fold["train_start"], end_date=fold["test_end"])
+        key = fold_key(fold_returns, {"fold": fold, "benchmark_weights": benchmark_weights, "cash_drag": cash_drag, "solver": solver})
+        cache_fname = None if cache_dir is None else os.path.join(cache_dir, f"{key}.json")
+        if cache_fname is not None and os.path.isfile(cache_fname):
+            with open(cache_fname, "r") as f:
+                fold_rows[fold["fold"]] = json.load(f)
+        else:
+            pending[fold["fold"]] = (fold_returns, fold, cache_fname)
+    print(f"Walk forward: {len(folds)} folds, {len(folds) - len(pending)} cached, {len(pending)} to run")
+
+    def _save(fold_id:int, rows:list) -> None:
+        fold_rows[fold_id] = rows
+        cache_fname = pending[fold_id][2]
+        if cache_fname is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            with open(cache_fname + ".tmp", "w") as f:
+                json.dump(rows, f)
+            os.replace(cache_fname + ".tmp", cache_fname)
+
+    if max_workers <= 1 or len(pending) <= 1:
+        for fold_id, (fold_returns, fold, _) in pending.items():
+            _save(fold_id, _run_fold(fold_returns, fold, benchmark_weights, cash_drag, solver))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(prof.profiled_call, _run_fold, fold_returns, fold, benchmark_weights, cash_drag, solver): fold_id for fold_id, (fold_returns, fold, _) in pending.items()}
+            for future in concurrent.futures.as_completed(futures):
+                _save(futures[future], prof.merge(*future.result()))
+
+    results = pd.DataFrame([row for fold in folds for row in fold_rows[fold["fold"]]])
+    results["bias_ratio"] = results["active_std"] / results["predicted_risk"]
+    return results